@@ -0,0 +1,163 @@
+import heapq
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from . import models, database, crud, jurisdiction
+
+# Counts are kept in memory per process; reload them from the database at
+# this interval so changes made by other workers don't drift forever.
+RELOAD_SECONDS = 60
+
+Officer = namedtuple("Officer", ["id", "username", "role"])
+
+HANDLER_ROLES = [
+    models.UserRole.VILLAGE_OFFICER,
+    models.UserRole.BLOCK_OFFICER,
+    models.UserRole.DISTRICT_OFFICER,
+    models.UserRole.DIRECTOR,
+]
+
+
+class OfficerLoad:
+    """
+    Open-queue depth per officer, with a min-heap per role so the least-loaded
+    officer is found in O(log n). Every count change pushes a fresh
+    (count, officer_id) entry; entries that no longer match _counts are stale
+    and dropped when they reach the top.
+    """
+
+    def __init__(self, reload_seconds=RELOAD_SECONDS):
+        self._reload_seconds = reload_seconds
+        self._lock = threading.RLock()
+        # Held for the duration of a reload, so a stale index triggers one, not one per caller
+        self._reload_lock = threading.Lock()
+        self._officers = {}  # officer_id -> (username, role)
+        self._counts = {}
+        self._heaps = {role: [] for role in HANDLER_ROLES}
+        self._loaded_at = None
+
+    def load(self):
+        # Queried without holding _lock; picks keep using the old counts until the swap
+        db = database.SessionLocal()
+        try:
+            officers = crud.get_users_by_roles(db, HANDLER_ROLES)
+            depths = dict(crud.get_open_queue_depths(db))
+        finally:
+            db.close()
+        with self._lock:
+            self._officers = {officer.id: (officer.username, officer.role) for officer in officers}
+            self._counts = {officer.id: depths.get(officer.id, 0) for officer in officers}
+            self._heaps = {role: [] for role in HANDLER_ROLES}
+            for officer_id, (_, role) in self._officers.items():
+                self._heaps[role].append((self._counts[officer_id], officer_id))
+            for heap in self._heaps.values():
+                heapq.heapify(heap)
+            self._loaded_at = time.monotonic()
+
+    def pick(self, role, district=None, taluk=None, village=None):
+        """
+        The least-loaded Officer with this role, or None. Officers whose
+        jurisdiction covers the given area are preferred; unmapped areas
+        fall back to every officer of the role.
+        """
+        return (district and self.pick_local(role, district, taluk, village)) or self._pick_any(role)
+
+    def pick_local(self, role, district, taluk=None, village=None):
+        """The least-loaded Officer of this role whose jurisdiction covers the area, or None."""
+        local = jurisdiction.jurisdictions.officers_for(role, district, taluk, village)
+        self._ensure_fresh()
+        with self._lock:
+            local = [officer_id for officer_id in local if officer_id in self._officers and self._officers[officer_id][1] == role]
+            if not local:
+                return None
+            officer_id = min(local, key=lambda officer_id: (self._counts[officer_id], officer_id))
+            return Officer(officer_id, *self._officers[officer_id])
+
+    def _pick_any(self, role):
+        self._ensure_fresh()
+        with self._lock:
+            heap = self._heaps.get(role, [])
+            while heap:
+                count, officer_id = heap[0]
+                if self._counts.get(officer_id) == count and self._officers[officer_id][1] == role:
+                    return Officer(officer_id, *self._officers[officer_id])
+                heapq.heappop(heap)
+            return None
+
+    def move(self, from_officer_id, to_officer_id):
+        """Record a request leaving one officer's open queue and/or joining another's."""
+        if from_officer_id == to_officer_id:
+            return
+        with self._lock:
+            if from_officer_id in self._counts:
+                self._set(from_officer_id, max(self._counts[from_officer_id] - 1, 0))
+            if to_officer_id in self._counts:
+                self._set(to_officer_id, self._counts[to_officer_id] + 1)
+
+    @contextmanager
+    def reservation(self, db):
+        """
+        For a batch that assigns several requests in one transaction. Record
+        the batch's move()s inside the block as it goes, so later picks in the
+        same batch spread out, and the block commits db on the way out. If
+        anything in it fails, db is rolled back and, since the moves counted
+        changes that never landed, queue depths are recounted from the
+        database before the error propagates.
+        """
+        try:
+            yield self
+            db.commit()
+        except BaseException:
+            db.rollback()
+            self.load()
+            raise
+
+    def add_officer(self, user):
+        if user.role not in HANDLER_ROLES:
+            return
+        with self._lock:
+            self._officers[user.id] = (user.username, user.role)
+            self._set(user.id, self._counts.get(user.id, 0))
+
+    def snapshot(self):
+        self._ensure_fresh()
+        with self._lock:
+            return [
+                {"officer_id": officer_id, "username": username, "role": role, "open_requests": self._counts[officer_id]}
+                for officer_id, (username, role) in sorted(self._officers.items())
+            ]
+
+    def _set(self, officer_id, count):
+        self._counts[officer_id] = count
+        role = self._officers[officer_id][1]
+        heap = self._heaps[role]
+        heapq.heappush(heap, (count, officer_id))
+        if len(heap) > 4 * len(self._counts) + 64:
+            # Compact away stale entries
+            self._heaps[role] = [(self._counts[i], i) for i, (_, r) in self._officers.items() if r == role]
+            heapq.heapify(self._heaps[role])
+
+    def _stale(self):
+        with self._lock:
+            return self._loaded_at is None or time.monotonic() - self._loaded_at > self._reload_seconds
+
+    def _ensure_fresh(self):
+        # Never called with _lock held: the reload queries the database
+        if not self._stale():
+            return
+        with self._lock:
+            never_loaded = self._loaded_at is None
+        # Until the first load every caller waits for it; after that one caller
+        # reloads and the rest carry on with the current counts
+        if not self._reload_lock.acquire(blocking=never_loaded):
+            return
+        try:
+            if self._stale():
+                self.load()
+        finally:
+            self._reload_lock.release()
+
+
+officer_load = OfficerLoad()
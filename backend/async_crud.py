@@ -0,0 +1,49 @@
+"""
+Async variants of the crud.py read queries for endpoints on the asyncio data
+layer. Statements are built by crud, so both paths run the same SQL.
+"""
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, crud, search
+
+
+async def get_managers(db: AsyncSession):
+    stmt = select(models.User).where(models.User.role.in_([models.UserRole.VILLAGE_OFFICER, models.UserRole.BLOCK_OFFICER]))
+    return (await db.scalars(stmt)).all()
+
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100):
+    return (await db.scalars(select(models.User).offset(skip).limit(limit))).all()
+
+async def _sorted_requests(db: AsyncSession, *criteria, skip: int, limit: int, include_audit_logs: bool, sort: str, seek: Optional[tuple]):
+    # Same two-phase sort=deadline paging as crud._sorted_requests
+    page = (await db.scalars(crud.requests_stmt(*criteria, skip=skip, limit=limit, include_audit_logs=include_audit_logs, sort=sort, seek=seek))).all()
+    if not crud.needs_undated_phase(sort, seek, page, limit):
+        return page
+    skip = 0 if seek is not None or page or not skip else max(skip - await db.scalar(crud.dated_requests_count_stmt(*criteria)), 0)
+    return page + (await db.scalars(crud.undated_requests_stmt(*criteria, skip=skip, limit=limit - len(page), include_audit_logs=include_audit_logs))).all()
+
+async def get_request(db: AsyncSession, request_id: int, filters=()):
+    stmt = crud.requests_stmt(models.Request.id == request_id, *filters, limit=1, include_audit_logs=True)
+    return (await db.scalars(stmt)).first()
+
+async def get_requests(db: AsyncSession, skip: int = 0, limit: int = 100, include_audit_logs: bool = False, seek: Optional[tuple] = None, filters=(), sort: str = "newest"):
+    return await _sorted_requests(db, *filters, skip=skip, limit=limit, include_audit_logs=include_audit_logs, sort=sort, seek=seek)
+
+async def get_requests_by_user(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100, include_audit_logs: bool = False, seek: Optional[tuple] = None, filters=(), sort: str = "newest"):
+    return await _sorted_requests(db, models.Request.submitter_id == user_id, *filters, skip=skip, limit=limit, include_audit_logs=include_audit_logs, sort=sort, seek=seek)
+
+async def get_officer_requests(db: AsyncSession, officer_id: int, skip: int = 0, limit: int = 100, include_audit_logs: bool = False, seek: Optional[tuple] = None, filters=(), sort: str = "newest"):
+    return await _sorted_requests(db, crud.officer_requests_criteria(officer_id), *filters, skip=skip, limit=limit, include_audit_logs=include_audit_logs, sort=sort, seek=seek)
+
+async def get_requests_actioned_by(db: AsyncSession, actor_id: int, skip: int = 0, limit: int = 100, include_audit_logs: bool = False, seek: Optional[tuple] = None):
+    stmt = crud.requests_stmt(crud.actioned_by_criteria(actor_id), skip=skip, limit=limit, include_audit_logs=include_audit_logs, seek=seek)
+    return (await db.scalars(stmt)).all()
+
+async def get_audit_logs(db: AsyncSession, skip: int = 0, limit: int = 100, before=None):
+    return (await db.scalars(crud.audit_logs_stmt(skip=skip, limit=limit, before=before))).all()
+
+async def search_requests(db: AsyncSession, match: str, skip: int = 0, limit: int = 100, include_audit_logs: bool = False, filters=()):
+    return (await db.scalars(search.search_stmt(match, *filters, skip=skip, limit=limit, include_audit_logs=include_audit_logs))).all()
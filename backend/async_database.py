@@ -0,0 +1,69 @@
+"""
+asyncio data layer for the hot read endpoints, alongside the sync one in
+database.py. Engines are created on first use, so scripts that only import
+the sync side never load the async drivers.
+"""
+import threading
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Delete, Insert, Update
+
+from . import database
+
+# Async driver for each backend; psycopg 3 serves both sync and async
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+psycopg"}
+
+
+def async_url(url):
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"No async driver configured for '{parsed.get_backend_name()}' databases")
+    return parsed.set(drivername=driver)
+
+
+def create_async_db_engine(url=database.SQLALCHEMY_DATABASE_URL, read_only=False, **overrides):
+    """Async engine for url with the same pool and connection settings as create_db_engine()."""
+    db_engine = create_async_engine(async_url(url), **database.engine_options(url, **overrides))
+    if db_engine.dialect.name == "sqlite":
+        database.apply_sqlite_pragmas(db_engine.sync_engine, read_only)
+    return db_engine
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_async_engine(read_only=False):
+    with _engines_lock:
+        if read_only not in _engines:
+            url = database.READ_DATABASE_URL if read_only else database.SQLALCHEMY_DATABASE_URL
+            _engines[read_only] = create_async_db_engine(url, read_only=read_only)
+        return _engines[read_only]
+
+
+async def dispose_engines():
+    with _engines_lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for db_engine in engines:
+        await db_engine.dispose()
+
+
+class AsyncRoutingSession(Session):
+    """Sends SELECTs to the async read engine and anything that writes to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            return get_async_engine().sync_engine
+        return get_async_engine(read_only=True).sync_engine
+
+
+# expire_on_commit=False: attributes can't be lazily reloaded outside an await
+AsyncReadSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, sync_session_class=AsyncRoutingSession)
+
+async def get_async_read_db():
+    """Async session for read-heavy endpoints; may lag the primary when it is a replica."""
+    async with AsyncReadSessionLocal() as db:
+        yield db
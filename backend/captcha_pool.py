@@ -0,0 +1,83 @@
+import base64
+import logging
+import os
+import queue
+import random
+import threading
+
+logger = logging.getLogger(__name__)
+
+CAPTCHA_POOL_SIZE = int(os.getenv("CAPTCHA_POOL_SIZE", "64"))
+# Excludes confusing characters like O, 0, I, 1, l
+CAPTCHA_CHARS = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+
+
+class CaptchaPool:
+    """
+    Keeps a queue of pre-rendered (text, image data URL) captchas topped up
+    by a background thread, so GET /auth/captcha only pops one. A single
+    ImageCaptcha instance is reused so its fonts are loaded once; the
+    captcha/PIL stack itself is only imported on the first render.
+    """
+
+    def __init__(self, size=CAPTCHA_POOL_SIZE):
+        self._ready = queue.Queue(maxsize=max(size, 1))
+        self._image = None
+        self._render_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def render(self):
+        text = ''.join(random.choice(CAPTCHA_CHARS) for _ in range(5))
+        with self._render_lock:
+            if self._image is None:
+                from captcha.image import ImageCaptcha
+                self._image = ImageCaptcha(width=160, height=60)
+            data = self._image.generate(text)
+        base64_img = base64.b64encode(data.getvalue()).decode('utf-8')
+        return text, f"data:image/png;base64,{base64_img}"
+
+    def take(self):
+        try:
+            return self._ready.get_nowait()
+        except queue.Empty:
+            # Pool drained (or producer not started): render on the caller's thread
+            return self.render()
+
+    def warm(self):
+        """Load the image stack now and queue one captcha ahead of the producer."""
+        try:
+            self._ready.put_nowait(self.render())
+        except queue.Full:
+            pass
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._produce, name="captcha-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _produce(self):
+        while not self._stop.is_set():
+            try:
+                item = self.render()
+            except Exception:
+                logger.exception("CAPTCHA pre-render failed")
+                self._stop.wait(1)
+                continue
+            while not self._stop.is_set():
+                try:
+                    self._ready.put(item, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+
+
+captcha_pool = CaptchaPool()
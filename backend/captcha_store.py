@@ -0,0 +1,102 @@
+import heapq
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+
+from . import models, database
+
+# "database" shares captchas between worker processes through the app's
+# database; "memory" keeps them per process (single-worker deployments).
+CAPTCHA_STORE_BACKEND = os.getenv("CAPTCHA_STORE", "database")
+CAPTCHA_TTL_SECONDS = 300
+# The database store deletes expired rows at most this often per process, so
+# GET /auth/captcha doesn't take the write lock twice on every call. pop()
+# rejects expired captchas either way.
+CAPTCHA_EVICT_SECONDS = 60
+
+
+class MemoryCaptchaStore:
+    """
+    Per-process store. A min-heap on expiry lets evict_expired() pop only the
+    entries that are due instead of scanning every captcha.
+    """
+
+    def __init__(self):
+        self._entries = {}  # captcha_id -> (text, expires_at)
+        self._expiry = []
+        self._lock = threading.Lock()
+
+    def put(self, captcha_id, text, ttl_seconds=CAPTCHA_TTL_SECONDS):
+        expires_at = time.time() + ttl_seconds
+        with self._lock:
+            self._entries[captcha_id] = (text, expires_at)
+            heapq.heappush(self._expiry, (expires_at, captcha_id))
+
+    def pop(self, captcha_id):
+        """Remove a captcha and return its text, or None if unknown or expired."""
+        with self._lock:
+            entry = self._entries.pop(captcha_id, None)
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    def evict_expired(self):
+        now = time.time()
+        with self._lock:
+            while self._expiry and self._expiry[0][0] < now:
+                expires_at, captcha_id = heapq.heappop(self._expiry)
+                entry = self._entries.get(captcha_id)
+                if entry and entry[1] == expires_at:
+                    del self._entries[captcha_id]
+
+
+class DatabaseCaptchaStore:
+    """
+    Captchas in the captchas table, so one issued by any worker process can be
+    solved on any other. Eviction is a range delete on the expires_at index,
+    run at most every evict_seconds.
+    """
+
+    def __init__(self, evict_seconds=CAPTCHA_EVICT_SECONDS):
+        self._evict_seconds = evict_seconds
+        self._evicted_at = None
+        self._lock = threading.Lock()
+
+    def put(self, captcha_id, text, ttl_seconds=CAPTCHA_TTL_SECONDS):
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        with database.engine.begin() as conn:
+            conn.execute(insert(models.Captcha.__table__).values(id=captcha_id, text=text, expires_at=expires_at))
+
+    def pop(self, captcha_id):
+        """Remove a captcha and return its text, or None if unknown or expired."""
+        captchas = models.Captcha.__table__
+        with database.engine.begin() as conn:
+            row = conn.execute(select(captchas.c.text, captchas.c.expires_at).where(captchas.c.id == captcha_id)).first()
+            if row is None:
+                return None
+            # Only the caller whose DELETE wins gets to use it
+            taken = conn.execute(delete(captchas).where(captchas.c.id == captcha_id)).rowcount
+        if not taken or row.expires_at < datetime.utcnow():
+            return None
+        return row.text
+
+    def evict_expired(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._evicted_at is not None and now - self._evicted_at < self._evict_seconds:
+                return
+            self._evicted_at = now
+        captchas = models.Captcha.__table__
+        with database.engine.begin() as conn:
+            conn.execute(delete(captchas).where(captchas.c.expires_at < datetime.utcnow()))
+
+
+def get_captcha_store(backend=CAPTCHA_STORE_BACKEND):
+    if backend == "memory":
+        return MemoryCaptchaStore()
+    if backend == "database":
+        return DatabaseCaptchaStore()
+    raise RuntimeError(f"Unknown CAPTCHA_STORE backend '{backend}'. Use 'database' or 'memory'.")
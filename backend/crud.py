@@ -1,6 +1,10 @@
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from . import models, schemas, auth
+from sqlalchemy import and_, func, or_, select, tuple_
+from sqlalchemy.orm import Session, joinedload, noload, selectinload
+from datetime import datetime
+from typing import Optional
+import base64
+import json
+from . import models, schemas, auth, system_config, sla_policy
 
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
@@ -22,8 +26,15 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    auth.principal_cache.invalidate(username=db_user.username)
     return db_user
 
+def get_users_by_roles(db: Session, roles):
+    return db.query(models.User).filter(models.User.role.in_(roles)).all()
+
+def get_users_by_ids(db: Session, user_ids):
+    return db.query(models.User).filter(models.User.id.in_(list(user_ids))).all()
+
 def get_users(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.User).offset(skip).limit(limit).all()
 
@@ -34,16 +45,71 @@ def reset_password(db: Session, user_id: int, new_password: str):
     db_user.hashed_password = auth.get_password_hash(new_password)
     db.commit()
     db.refresh(db_user)
+    auth.principal_cache.invalidate(user_id=db_user.id, username=db_user.username)
     return db_user
 
-def get_sla_minutes(db: Session):
-    config = db.query(models.SystemConfig).filter(models.SystemConfig.key == "sla_minutes").first()
-    return int(config.value) if config else 10 # Default 10 minutes
+def get_jurisdictions(db: Session):
+    return db.query(models.Jurisdiction).all()
+
+def get_jurisdiction_coverage(db: Session):
+    # (officer_id, role, district, taluk, village) per jurisdiction, in one joined SELECT
+    return db.execute(
+        select(models.Jurisdiction.officer_id, models.User.role, models.Jurisdiction.district, models.Jurisdiction.taluk, models.Jurisdiction.village)
+        .join(models.User, models.User.id == models.Jurisdiction.officer_id)
+    ).all()
+
+def create_jurisdiction(db: Session, jurisdiction: schemas.JurisdictionCreate):
+    db_jurisdiction = models.Jurisdiction(**jurisdiction.model_dump())
+    db.add(db_jurisdiction)
+    db.commit()
+    db.refresh(db_jurisdiction)
+    return db_jurisdiction
+
+def delete_jurisdiction(db: Session, jurisdiction_id: int):
+    db_jurisdiction = db.query(models.Jurisdiction).filter(models.Jurisdiction.id == jurisdiction_id).first()
+    if not db_jurisdiction:
+        return None
+    db.delete(db_jurisdiction)
+    db.commit()
+    return db_jurisdiction
+
+def get_sla_policies(db: Session):
+    return db.query(models.SlaPolicy).order_by(models.SlaPolicy.tier, models.SlaPolicy.urgency, models.SlaPolicy.district).all()
+
+def set_sla_policy(db: Session, policy: schemas.SlaPolicyCreate):
+    # One row per (tier, urgency, district), districts matched case-insensitively
+    # as uq_sla_policies_tier_urgency_district_ci enforces; setting it again
+    # replaces the minutes and the district's spelling
+    district = (policy.district or "").strip() or None
+    db_policy = db.query(models.SlaPolicy).filter(
+        models.SlaPolicy.tier == policy.tier,
+        models.SlaPolicy.urgency == policy.urgency,
+        func.lower(models.SlaPolicy.district) == district.lower() if district else models.SlaPolicy.district.is_(None)
+    ).first()
+    if not db_policy:
+        db_policy = models.SlaPolicy(tier=policy.tier, urgency=policy.urgency)
+        db.add(db_policy)
+    db_policy.district = district
+    db_policy.minutes = policy.minutes
+    system_config.system_config.bump_version(db)
+    db.commit()
+    db.refresh(db_policy)
+    system_config.system_config.invalidate()
+    return db_policy
+
+def delete_sla_policy(db: Session, policy_id: int):
+    db_policy = db.query(models.SlaPolicy).filter(models.SlaPolicy.id == policy_id).first()
+    if not db_policy:
+        return None
+    db.delete(db_policy)
+    system_config.system_config.bump_version(db)
+    db.commit()
+    system_config.system_config.invalidate()
+    return db_policy
 
 def create_request(db: Session, request: schemas.RequestCreate, user_id: int):
-    # Calculate SLA deadline
-    sla_minutes = get_sla_minutes(db)
-    deadline = datetime.utcnow() + timedelta(minutes=sla_minutes)
+    # Calculate SLA deadline from the compiled policy table
+    deadline = sla_policy.policies.deadline(models.RequestStatus.PENDING_VILLAGE, request.urgency, request.district)
     
     db_request = models.Request(
         title=request.title,
@@ -65,11 +131,225 @@ def create_request(db: Session, request: schemas.RequestCreate, user_id: int):
     )
     return db_request
 
-def get_requests_by_user(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-    return db.query(models.Request).filter(models.Request.submitter_id == user_id).order_by(models.Request.id.desc()).offset(skip).limit(limit).all()
+# Many-to-one user relationships rendered as *_username on RequestOut.
+# Joined in the same SELECT so a page of requests costs one query, not 3 per row.
+REQUEST_USER_LOADS = (
+    joinedload(models.Request.submitter),
+    joinedload(models.Request.current_handler),
+    joinedload(models.Request.actioned_by),
+)
+
+def request_list_loads(include_audit_logs: bool = False):
+    # Audit trails are opt-in on list endpoints: batch them in one SELECT ... IN
+    # when asked for, otherwise skip the per-row lazy load entirely.
+    audit_load = selectinload(models.Request.audit_logs) if include_audit_logs else noload(models.Request.audit_logs)
+    return REQUEST_USER_LOADS + (audit_load,)
+
+def attach_usernames(requests):
+    for req in requests:
+        req.handler_username = req.current_handler.username if req.current_handler else None
+        req.actioned_by_username = req.actioned_by.username if req.actioned_by else None
+        req.submitter_username = req.submitter.username if req.submitter else None
+    return requests
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    # Raises ValueError/TypeError on tampered or malformed cursors.
+    values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    if not isinstance(values, list):
+        raise ValueError("Malformed cursor")
+    return values
+
+def decode_timestamp_cursor(cursor: str):
+    last_timestamp, last_id = decode_cursor(cursor)
+    return datetime.fromisoformat(last_timestamp), int(last_id)
+
+# Orders a request list can be sorted in. Each has a keyset: the cursor
+# holds the last row's key, and the next page seeks past it.
+REQUEST_SORTS = ["newest", "oldest", "deadline"]
+
+def request_cursor(request, sort: str = "newest") -> str:
+    if sort == "deadline":
+        return encode_cursor(request.sla_deadline, request.id)
+    return encode_cursor(request.id)
+
+def decode_request_cursor(cursor: str, sort: str = "newest") -> tuple:
+    if sort == "deadline":
+        last_deadline, last_id = decode_cursor(cursor)
+        return (datetime.fromisoformat(last_deadline) if last_deadline is not None else None), int(last_id)
+    (last_id,) = decode_cursor(cursor)
+    return (int(last_id),)
+
+def _undated_phase(sort: str, seek: Optional[tuple]) -> bool:
+    # sort=deadline pages requests with a deadline first, then those without
+    # one (closed, or final tier); a cursor with no deadline is in the second.
+    return sort == "deadline" and seek is not None and seek[0] is None
+
+def _request_keyset(sort: str, seek: Optional[tuple]):
+    """(WHERE clauses, ORDER BY) for one page; each order walks an index, so no page sorts the table."""
+    if sort == "oldest":
+        return ([models.Request.id > seek[0]] if seek else []), [models.Request.id.asc()]
+    if _undated_phase(sort, seek):
+        return [models.Request.sla_deadline.is_(None), models.Request.id > seek[1]], [models.Request.id.asc()]
+    if sort == "deadline":
+        # Soonest deadline first, on ix_requests_sla_deadline
+        criteria = [models.Request.sla_deadline.isnot(None)]
+        if seek:
+            criteria.append(tuple_(models.Request.sla_deadline, models.Request.id) > tuple_(*seek))
+        return criteria, [models.Request.sla_deadline.asc(), models.Request.id.asc()]
+    return ([models.Request.id < seek[0]] if seek else []), [models.Request.id.desc()]
+
+def request_filter_criteria(filters: schemas.RequestFilters, now: Optional[datetime] = None) -> list:
+    """WHERE clauses for the GET /requests filters, each matching an index prefix where one exists."""
+    criteria = []
+    if filters.status:
+        criteria.append(models.Request.status.in_(filters.status))
+    if filters.urgency:
+        criteria.append(models.Request.urgency.in_(filters.urgency))
+    # Equality on the leading columns of ix_requests_location
+    for column, value in [(models.Request.district, filters.district), (models.Request.taluk, filters.taluk), (models.Request.village, filters.village)]:
+        if value:
+            criteria.append(column == value)
+    if filters.created_from:
+        criteria.append(models.Request.created_at >= filters.created_from)
+    if filters.created_to:
+        criteria.append(models.Request.created_at < filters.created_to)
+    if filters.updated_from:
+        criteria.append(models.Request.updated_at >= filters.updated_from)
+    if filters.updated_to:
+        criteria.append(models.Request.updated_at < filters.updated_to)
+    if filters.sla_breached:
+        # Same shape as the escalation sweep, served by ix_requests_status_sla_deadline
+        criteria.append(and_(models.Request.status.in_(SLA_TRACKED_STATUSES), models.Request.sla_deadline < (now or datetime.utcnow())))
+    return criteria
+
+# List queries are built as select() statements so the async data layer
+# (async_crud.py) runs exactly the same SQL as these sync functions.
+def requests_stmt(*criteria, skip: int = 0, limit: int = 100, include_audit_logs: bool = False, sort: str = "newest", seek: Optional[tuple] = None):
+    # Keyset pagination: with a cursor, seek past the last seen row instead of
+    # using OFFSET, so deep pages cost the same as the first one.
+    keyset, order = _request_keyset(sort, seek)
+    stmt = select(models.Request).options(*request_list_loads(include_audit_logs)).where(*criteria, *keyset).order_by(*order)
+    if seek is not None:
+        return stmt.limit(limit)
+    return stmt.offset(skip).limit(limit)
+
+def undated_requests_stmt(*criteria, skip: int = 0, limit: int = 100, include_audit_logs: bool = False):
+    # Second phase of sort=deadline, once the requests with a deadline run out
+    return requests_stmt(*criteria, limit=limit, include_audit_logs=include_audit_logs, sort="deadline", seek=(None, 0)).offset(skip)
+
+def dated_requests_count_stmt(*criteria):
+    return select(func.count()).select_from(models.Request).where(*criteria, models.Request.sla_deadline.isnot(None))
+
+def needs_undated_phase(sort: str, seek: Optional[tuple], page: list, limit: int) -> bool:
+    """Whether a sort=deadline page ran out of dated requests and continues with undated ones."""
+    return sort == "deadline" and len(page) < limit and not _undated_phase(sort, seek)
+
+def _sorted_requests(db: Session, *criteria, skip: int, limit: int, include_audit_logs: bool, sort: str, seek: Optional[tuple]):
+    page = db.scalars(requests_stmt(*criteria, skip=skip, limit=limit, include_audit_logs=include_audit_logs, sort=sort, seek=seek)).all()
+    if not needs_undated_phase(sort, seek, page, limit):
+        return page
+    # Offset into the undated requests: none if this page reached them, else
+    # whatever of skip the dated requests didn't cover
+    skip = 0 if seek is not None or page or not skip else max(skip - db.scalar(dated_requests_count_stmt(*criteria)), 0)
+    return page + db.scalars(undated_requests_stmt(*criteria, skip=skip, limit=limit - len(page), include_audit_logs=include_audit_logs)).all()
+
+def officer_requests_criteria(officer_id: int):
+    # Requests the officer forwarded that are still pending further up, as a
+    # subquery so the queue and the forwarded set are paged together in SQL.
+    forwarded_ids = select(models.AuditLog.request_id).where(
+        models.AuditLog.actor_id == officer_id,
+        models.AuditLog.action.in_(["APPROVED_VILLAGE", "APPROVED_BLOCK", "ESCALATED"])
+    )
+    return or_(
+        models.Request.current_handler_id == officer_id,
+        and_(
+            models.Request.id.in_(forwarded_ids),
+            models.Request.status.in_([models.RequestStatus.PENDING_BLOCK, models.RequestStatus.PENDING_DISTRICT])
+        )
+    )
+
+def actioned_by_criteria(actor_id: int):
+    return models.Request.id.in_(select(models.AuditLog.request_id).where(models.AuditLog.actor_id == actor_id))
+
+def get_requests(db: Session, skip: int = 0, limit: int = 100, include_audit_logs: bool = False, seek: Optional[tuple] = None, filters=(), sort: str = "newest"):
+    return _sorted_requests(db, *filters, skip=skip, limit=limit, include_audit_logs=include_audit_logs, sort=sort, seek=seek)
+
+def get_requests_by_user(db: Session, user_id: int, skip: int = 0, limit: int = 100, include_audit_logs: bool = False, seek: Optional[tuple] = None, filters=(), sort: str = "newest"):
+    return _sorted_requests(db, models.Request.submitter_id == user_id, *filters, skip=skip, limit=limit, include_audit_logs=include_audit_logs, sort=sort, seek=seek)
+
+def get_officer_requests(db: Session, officer_id: int, skip: int = 0, limit: int = 100, include_audit_logs: bool = False, seek: Optional[tuple] = None, filters=(), sort: str = "newest"):
+    return _sorted_requests(db, officer_requests_criteria(officer_id), *filters, skip=skip, limit=limit, include_audit_logs=include_audit_logs, sort=sort, seek=seek)
+
+def get_requests_actioned_by(db: Session, actor_id: int, skip: int = 0, limit: int = 100, include_audit_logs: bool = False, seek: Optional[tuple] = None):
+    stmt = requests_stmt(actioned_by_criteria(actor_id), skip=skip, limit=limit, include_audit_logs=include_audit_logs, seek=seek)
+    return db.scalars(stmt).all()
+
+def audit_logs_stmt(skip: int = 0, limit: int = 100, before=None):
+    stmt = select(models.AuditLog).order_by(models.AuditLog.timestamp.desc(), models.AuditLog.id.desc())
+    if before is not None:
+        last_timestamp, last_id = before
+        return stmt.where(or_(
+            models.AuditLog.timestamp < last_timestamp,
+            and_(models.AuditLog.timestamp == last_timestamp, models.AuditLog.id < last_id)
+        )).limit(limit)
+    return stmt.offset(skip).limit(limit)
+
+def get_requests_by_ids(db: Session, request_ids):
+    # Submitters are joined for the final-approval notification
+    return db.query(models.Request).options(joinedload(models.Request.submitter)).filter(models.Request.id.in_(list(request_ids))).all()
+
+def get_audit_logs(db: Session, skip: int = 0, limit: int = 100, before=None):
+    return db.scalars(audit_logs_stmt(skip=skip, limit=limit, before=before)).all()
+
+# Statuses whose sla_deadline triggers an automatic escalation
+SLA_TRACKED_STATUSES = [models.RequestStatus.PENDING_VILLAGE, models.RequestStatus.PENDING_BLOCK]
+
+def get_expired_requests(db: Session, now: datetime, after_id: int = 0, limit: int = 500):
+    # (id, status, urgency, current_handler_id, district, taluk, village) of pending requests that have missed their SLA,
+    # in id order so the sweep can walk them in chunks (served by ix_requests_status_sla_deadline)
+    return db.query(
+        models.Request.id, models.Request.status, models.Request.urgency, models.Request.current_handler_id,
+        models.Request.district, models.Request.taluk, models.Request.village
+    ).filter(
+        models.Request.status.in_(SLA_TRACKED_STATUSES),
+        models.Request.sla_deadline < now,
+        models.Request.id > after_id
+    ).order_by(models.Request.id).limit(limit).all()
+
+def get_requests_updated_at(db: Session, request_ids, updated_at: datetime):
+    # Which of request_ids were last written at exactly updated_at (looked up by primary key)
+    return db.scalars(select(models.Request.id).where(models.Request.id.in_(request_ids), models.Request.updated_at == updated_at)).all()
+
+# Statuses in which a request sits in its current handler's queue
+OPEN_STATUSES = SLA_TRACKED_STATUSES + [models.RequestStatus.PENDING_DISTRICT]
+
+def get_open_queue_depths(db: Session):
+    return db.query(models.Request.current_handler_id, func.count(models.Request.id)).filter(
+        models.Request.status.in_(OPEN_STATUSES),
+        models.Request.current_handler_id.isnot(None)
+    ).group_by(models.Request.current_handler_id).all()
+
+def get_next_sla_deadline(db: Session):
+    # One index seek per status; an IN over both would sort every pending row
+    candidates = [
+        db.query(models.Request.id, models.Request.sla_deadline).filter(
+            models.Request.status == status,
+            models.Request.sla_deadline.isnot(None)
+        ).order_by(models.Request.sla_deadline).first()
+        for status in SLA_TRACKED_STATUSES
+    ]
+    candidates = [row for row in candidates if row]
+    return min(candidates, key=lambda row: row.sla_deadline) if candidates else None
 
-def get_requests_by_handler(db: Session, handler_id: int, skip: int = 0, limit: int = 100):
-    return db.query(models.Request).filter(models.Request.current_handler_id == handler_id).order_by(models.Request.id.desc()).offset(skip).limit(limit).all()
+def get_sla_deadlines(db: Session):
+    return db.query(models.Request.id, models.Request.sla_deadline).filter(
+        models.Request.status.in_(SLA_TRACKED_STATUSES),
+        models.Request.sla_deadline.isnot(None)
+    ).all()
 
 def update_request_status(db: Session, request: models.Request, status: models.RequestStatus, reason: str = None):
     request.status = status
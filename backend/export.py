@@ -0,0 +1,93 @@
+"""
+Streaming exports of requests and audit logs. Rows come off a server-side
+cursor EXPORT_BATCH_SIZE at a time and are encoded (and optionally gzipped)
+as they arrive, so memory stays flat however many rows are exported.
+"""
+import csv
+import enum
+import io
+import json
+import zlib
+from datetime import datetime
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from . import models, database
+
+EXPORT_BATCH_SIZE = 1000
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def requests_query(since=None, until=None):
+    """Every request column plus the submitter/handler/actioned-by usernames, oldest first."""
+    requests = models.Request.__table__
+    submitter, handler, actioned_by = (aliased(models.User) for _ in range(3))
+    stmt = select(
+        requests,
+        submitter.username.label("submitter_username"),
+        handler.username.label("handler_username"),
+        actioned_by.username.label("actioned_by_username"),
+    ).outerjoin(submitter, submitter.id == requests.c.submitter_id
+    ).outerjoin(handler, handler.id == requests.c.current_handler_id
+    ).outerjoin(actioned_by, actioned_by.id == requests.c.actioned_by_id)
+    if since is not None:
+        stmt = stmt.where(requests.c.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(requests.c.created_at < until)
+    return stmt.order_by(requests.c.id)
+
+def audit_logs_query(since=None, until=None):
+    audit_logs = models.AuditLog.__table__
+    stmt = select(audit_logs)
+    if since is not None:
+        stmt = stmt.where(audit_logs.c.timestamp >= since)
+    if until is not None:
+        stmt = stmt.where(audit_logs.c.timestamp < until)
+    return stmt.order_by(audit_logs.c.timestamp, audit_logs.c.id)
+
+
+def _plain(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _encode(rows, columns, fmt, header=False):
+    if fmt == "ndjson":
+        return "".join(json.dumps(dict(zip(columns, map(_plain, row)))) + "\n" for row in rows).encode()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows([_plain(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+def stream_rows(stmt, fmt, compress=False):
+    """Encoded chunks of stmt's result, one per batch of rows."""
+    compressor = zlib.compressobj(wbits=31) if compress else None # 31 = gzip framing
+    with database.read_engine.connect() as conn:
+        result = conn.execution_options(yield_per=EXPORT_BATCH_SIZE).execute(stmt)
+        columns = list(result.keys())
+        header = fmt == "csv"
+        for rows in result.partitions():
+            chunk = _encode(rows, columns, fmt, header)
+            header = False
+            yield compressor.compress(chunk) if compressor else chunk
+        if header:
+            # No rows: a CSV still gets its header line
+            chunk = _encode([], columns, fmt, header)
+            yield compressor.compress(chunk) if compressor else chunk
+    if compressor:
+        yield compressor.flush()
+
+
+def streaming_response(name, stmt, fmt, compress=False):
+    filename = f"{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}" + (".gz" if compress else "")
+    return StreamingResponse(
+        stream_rows(stmt, fmt, compress),
+        media_type="application/gzip" if compress else MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,94 @@
+"""
+bcrypt hashing, optionally offloaded to a dedicated process pool.
+
+Kept free of app imports so pool workers only load passlib.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hash/verify calls allowed in flight (running or queued) before new ones are refused.
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", str(4 * BCRYPT_WORKERS)))
+
+
+def hash_password(password):
+    return pwd_context.hash(password)
+
+def check_password(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PoolBusy(Exception):
+    pass
+
+
+class PoolBroken(PoolBusy):
+    """The pool lost a worker and the retry on a fresh pool failed too."""
+
+
+class HashingPool:
+    """
+    Runs bcrypt work in worker processes so it can't starve the API's
+    threadpool. Until start() is called (scripts, tests) work runs inline.
+    """
+
+    def __init__(self, workers=BCRYPT_WORKERS, max_pending=BCRYPT_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max(max_pending, 1))
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _new_executor(self):
+        # spawn: the API process has threads, which fork would copy mid-state
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def start(self):
+        with self._executor_lock:
+            if self._executor is None and self.workers > 0:
+                self._executor = self._new_executor()
+
+    def shutdown(self):
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _replace(self, broken):
+        """Swap a broken executor for a fresh one; returns the executor to use, or None if shut down."""
+        with self._executor_lock:
+            if self._executor is broken:
+                # A worker died (crash, OOM kill): the executor refuses all work from now on
+                self._executor = self._new_executor()
+                broken.shutdown(wait=False, cancel_futures=True)
+            return self._executor
+
+    def run(self, fn, *args):
+        executor = self._executor
+        if executor is None:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PoolBusy()
+        try:
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                executor = self._replace(executor)
+                if executor is None:
+                    raise PoolBroken()
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                raise PoolBroken()
+        finally:
+            self._slots.release()
+
+
+hashing_pool = HashingPool()
@@ -0,0 +1,128 @@
+"""
+Bulk intake of farmer applications, for FPOs submitting their members'
+requests in one upload instead of one POST /requests/ per farmer.
+"""
+import csv
+import io
+import logging
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+
+from . import models, schemas, crud, sla, sla_policy, assignment
+
+logger = logging.getLogger(__name__)
+
+# Rows inserted per transaction
+INTAKE_CHUNK_SIZE = 500
+# Rows accepted per upload; reading stops at the first row past it, which is reported as failed
+INTAKE_MAX_ROWS = 10000
+
+
+class UnreadableRow(str):
+    """Yielded by csv_rows() in place of a row it could not decode; reading stops there."""
+
+
+def csv_rows(binary_file):
+    """Rows of an uploaded CSV as dicts, read incrementally. Blank cells count as missing."""
+    reader = csv.DictReader(io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline=""))
+    try:
+        for row in reader:
+            yield {key.strip(): value.strip() for key, value in row.items() if key and isinstance(value, str) and value.strip()}
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Rows already read may have been saved, so report this instead of failing the upload
+        yield UnreadableRow(f"Could not read CSV: {e}")
+
+
+def _validation_error(exc: ValidationError):
+    return "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors())
+
+
+def _resolve_handler(request, submitter, targets):
+    """Same routing as POST /requests/, against this chunk's prefetched target officers."""
+    if request.target_manager_id:
+        target = targets.get(request.target_manager_id)
+        if not target:
+            return None, "Target Village Officer ID not found"
+        if target.role != models.UserRole.VILLAGE_OFFICER:
+            return None, f"Target user role '{target.role}' is not a Village Officer"
+        return target.id, None
+    local_officer = assignment.officer_load.pick_local(models.UserRole.VILLAGE_OFFICER, request.district, request.taluk, request.village)
+    if local_officer:
+        return local_officer.id, None
+    if submitter.manager_id:
+        return submitter.manager_id, None
+    fallback = assignment.officer_load.pick(models.UserRole.VILLAGE_OFFICER)
+    if fallback:
+        return fallback.id, None
+    return None, "No Village Officer available to process request"
+
+
+def _insert_chunk(db, chunk, submitter):
+    """Insert one chunk of validated (result, RequestCreate) pairs in a single transaction."""
+    target_ids = {request.target_manager_id for _, request in chunk if request.target_manager_id}
+    targets = {user.id: user for user in crud.get_users_by_ids(db, target_ids)} if target_ids else {}
+
+    requests = models.Request.__table__
+    rows, accepted = [], []
+    try:
+        with assignment.officer_load.reservation(db) as officers:
+            for result, request in chunk:
+                handler_id, error = _resolve_handler(request, submitter, targets)
+                if error:
+                    result["error"] = error
+                    continue
+                officers.move(None, handler_id)
+                values = request.model_dump(exclude={"target_manager_id"})
+                values.update(
+                    submitter_id=submitter.id,
+                    current_handler_id=handler_id,
+                    status=models.RequestStatus.PENDING_VILLAGE,
+                    sla_deadline=sla_policy.policies.deadline(models.RequestStatus.PENDING_VILLAGE, request.urgency, request.district),
+                )
+                rows.append(values)
+                accepted.append(result)
+            if not rows:
+                return
+            ids = db.execute(insert(requests).returning(requests.c.id, sort_by_parameter_order=True), rows).scalars().all()
+    except Exception:
+        logger.exception(f"Bulk intake chunk of {len(rows)} rows failed for '{submitter.username}'")
+        for result in accepted:
+            result["error"] = "Could not be saved, please resubmit this row"
+        return
+
+    for result, request_id, values in zip(accepted, ids, rows):
+        result["request_id"] = request_id
+        sla.escalations.schedule(request_id, values["sla_deadline"])
+
+
+def submit_batch(db, rows, submitter, chunk_size=INTAKE_CHUNK_SIZE, max_rows=INTAKE_MAX_ROWS):
+    """
+    Validate and insert applications on behalf of submitter. rows is any
+    iterable of dicts (a JSON array, or csv_rows() of an upload) and is
+    consumed lazily; valid rows are inserted every chunk_size rows. Returns
+    a schemas.BulkIntakeOut-shaped dict with one result per row, in order.
+    """
+    results, chunk = [], []
+    for number, row in enumerate(rows, start=1):
+        result = {"row": number, "request_id": None, "error": None}
+        results.append(result)
+        if number > max_rows:
+            result["error"] = f"Batch limit of {max_rows} rows exceeded"
+            break
+        if isinstance(row, UnreadableRow):
+            result["error"] = str(row)
+            break
+        try:
+            chunk.append((result, schemas.RequestCreate.model_validate(row)))
+        except ValidationError as exc:
+            result["error"] = _validation_error(exc)
+        if len(chunk) >= chunk_size:
+            _insert_chunk(db, chunk, submitter)
+            chunk = []
+    if chunk:
+        _insert_chunk(db, chunk, submitter)
+
+    created = sum(1 for result in results if result["request_id"] is not None)
+    logger.info(f"Bulk intake by '{submitter.username}': {created} created, {len(results) - created} failed")
+    return {"created": created, "failed": len(results) - created, "results": results}
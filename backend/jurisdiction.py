@@ -0,0 +1,73 @@
+import threading
+import time
+
+from . import database, crud
+
+# Other workers' admin changes are picked up at this interval; changes made
+# through this process's admin API rebuild the index immediately.
+RELOAD_SECONDS = 60
+
+
+def _area_key(district, taluk=None, village=None):
+    return tuple((part or "").strip().casefold() or None for part in (district, taluk, village))
+
+
+class JurisdictionIndex:
+    """
+    In-memory map from (role, district, taluk, village) to the officers
+    covering that area, so routing never scans the users table. Lookups fall
+    back from the village to its taluk to its district, and the most specific
+    level with any officer of the role wins.
+    """
+
+    def __init__(self, reload_seconds=RELOAD_SECONDS):
+        self._reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        # Held for the duration of a reload, so a stale index triggers one, not one per caller
+        self._reload_lock = threading.Lock()
+        self._index = {}
+        self._loaded_at = None
+
+    def load(self):
+        # Built without holding _lock; lookups keep using the old index until the swap
+        db = database.SessionLocal()
+        try:
+            index = {}
+            for officer_id, role, district, taluk, village in crud.get_jurisdiction_coverage(db):
+                index.setdefault((role,) + _area_key(district, taluk, village), set()).add(officer_id)
+        finally:
+            db.close()
+        with self._lock:
+            self._index = index
+            self._loaded_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        with self._lock:
+            loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at <= self._reload_seconds:
+            return
+        # Until the first load every caller waits for it; after that one caller
+        # reloads and the rest carry on with the current index
+        if not self._reload_lock.acquire(blocking=loaded_at is None):
+            return
+        try:
+            with self._lock:
+                stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self._reload_seconds
+            if stale:
+                self.load()
+        finally:
+            self._reload_lock.release()
+
+    def officers_for(self, role, district=None, taluk=None, village=None):
+        """Ids of the officers of this role covering the area; empty if unmapped."""
+        district, taluk, village = _area_key(district, taluk, village)
+        self._ensure_fresh()
+        with self._lock:
+            for key in [(district, taluk, village), (district, taluk, None), (district, None, None)]:
+                officers = self._index.get((role,) + key)
+                if officers:
+                    return officers
+        return set()
+
+
+jurisdictions = JurisdictionIndex()
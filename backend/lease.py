@@ -0,0 +1,111 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from . import models, database
+
+logger = logging.getLogger(__name__)
+
+# A leader that misses heartbeats for this long is considered dead.
+LEASE_TTL_SECONDS = 15
+HEARTBEAT_SECONDS = 5
+
+
+class LeaderLease:
+    """
+    Leader election through a row in the leases table. Whoever holds an
+    unexpired lease is the leader; it renews it every heartbeat, and any
+    other process takes it over once it lapses. Acquire and renew are a
+    single conditional UPDATE, so the database arbitrates concurrent claims.
+    """
+
+    def __init__(self, name, on_acquire=None, on_release=None, ttl_seconds=LEASE_TTL_SECONDS, heartbeat_seconds=HEARTBEAT_SECONDS):
+        self.name = name
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._on_acquire = on_acquire
+        self._on_release = on_release
+        self._ttl = timedelta(seconds=ttl_seconds)
+        self._heartbeat_seconds = heartbeat_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def try_acquire(self):
+        """Acquire or renew the lease. Returns True if this process holds it."""
+        now = datetime.utcnow()
+        leases = models.Lease.__table__
+        with database.engine.begin() as conn:
+            claimed = conn.execute(
+                update(leases)
+                .where(leases.c.name == self.name, or_(leases.c.holder == self.holder, leases.c.expires_at < now))
+                .values(holder=self.holder, expires_at=now + self._ttl)
+            ).rowcount
+        if claimed:
+            return True
+        try:
+            with database.engine.begin() as conn:
+                conn.execute(insert(leases).values(name=self.name, holder=self.holder, expires_at=now + self._ttl))
+            return True
+        except IntegrityError:
+            # Row exists and is held by a live leader
+            return False
+
+    def release(self):
+        leases = models.Lease.__table__
+        with database.engine.begin() as conn:
+            conn.execute(
+                update(leases)
+                .where(leases.c.name == self.name, leases.c.holder == self.holder)
+                .values(expires_at=datetime.utcnow())
+            )
+
+    def heartbeat(self):
+        try:
+            leading = self.try_acquire()
+        except Exception:
+            # Can't prove we still hold it; step down rather than risk two leaders
+            logger.exception(f"Error renewing '{self.name}' lease")
+            leading = False
+        if leading and not self.is_leader:
+            self.is_leader = True
+            logger.info(f"Acquired '{self.name}' lease as {self.holder}")
+            if self._on_acquire:
+                self._on_acquire()
+        elif not leading and self.is_leader:
+            self.is_leader = False
+            logger.warning(f"Lost '{self.name}' lease")
+            if self._on_release:
+                self._on_release()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.heartbeat()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self.is_leader:
+            self.is_leader = False
+            if self._on_release:
+                self._on_release()
+            # Hand over immediately instead of making followers wait out the TTL
+            try:
+                self.release()
+            except Exception:
+                logger.exception(f"Error releasing '{self.name}' lease")
+
+    def _run(self):
+        while not self._stop.wait(self._heartbeat_seconds):
+            self.heartbeat()
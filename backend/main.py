@@ -1,16 +1,57 @@
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 
-from apscheduler.schedulers.background import BackgroundScheduler
 from sqlalchemy.orm import Session
-from datetime import datetime
-from backend import models, database
+from backend import models, database, async_database, sla, hashing, captcha_pool, assignment, jurisdiction, system_config, sla_policy, search
 from backend.routers import auth, requests, admin
 
-models.Base.metadata.create_all(bind=database.engine)
+UPLOADS_DIR = "backend/uploads"
+# Set STARTUP_WARMUP=1 to fill the in-memory caches before serving instead of on first use
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "0") == "1"
+
+
+def warm_up():
+    system_config.system_config.load()
+    assignment.officer_load.load()
+    jurisdiction.jurisdictions.load()
+    captcha_pool.captcha_pool.warm()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing here runs at import, so importing the app (tests, tooling,
+    # forking workers) touches no database, thread or process pool.
+    models.Base.metadata.create_all(bind=database.engine)
+    sla_policy.normalize_districts(database.engine)
+    models.create_missing_indexes(database.engine)
+    search.create_search_index(database.engine)
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    # Compile SLA policies now so the first deadline doesn't pay for it
+    await run_in_threadpool(sla_policy.policies.load)
+    if STARTUP_WARMUP:
+        await run_in_threadpool(warm_up)
+
+    # bcrypt runs in its own worker processes
+    hashing.hashing_pool.start()
+    # Keep pre-rendered CAPTCHAs ready for /auth/captcha
+    captcha_pool.captcha_pool.start()
+    # SLA Monitoring
+    sla.leadership.start()
+    try:
+        yield
+    finally:
+        sla.leadership.stop()
+        hashing.hashing_pool.shutdown()
+        captcha_pool.captcha_pool.stop()
+        await async_database.dispose_engines()
+
 
-app = FastAPI(title="Smart Process Governance System")
+app = FastAPI(title="Smart Process Governance System", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -19,15 +60,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(auth.router)
 app.include_router(requests.router)
 app.include_router(admin.router)
 
-import os
-os.makedirs("backend/uploads", exist_ok=True)
-app.mount("/uploads", StaticFiles(directory="backend/uploads"), name="uploads")
+# The directory is created by the lifespan, before the first request
+app.mount("/uploads", StaticFiles(directory=UPLOADS_DIR, check_dir=False), name="uploads")
 
 from fastapi.responses import JSONResponse
 from fastapi.requests import Request
@@ -42,93 +83,6 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"detail": "Internal Server Error. Please contact support."},
     )
 
-# SLA Monitoring
-def check_sla_violations():
-    db = database.SessionLocal()
-    try:
-        now = datetime.utcnow()
-        # Find all pending requests that have missed their SLA
-        expired_requests = db.query(models.Request).filter(
-            models.Request.status.in_([
-                models.RequestStatus.PENDING_VILLAGE, 
-                models.RequestStatus.PENDING_BLOCK
-            ]),
-            models.Request.sla_deadline < now
-        ).all()
-        
-        import random
-        for req in expired_requests:
-            
-            # Tier 1 Miss: Village -> Escalate to Block
-            if req.status == models.RequestStatus.PENDING_VILLAGE:
-                req.status = models.RequestStatus.PENDING_BLOCK
-                blocks = db.query(models.User).filter(models.User.role == models.UserRole.BLOCK_OFFICER).all()
-                if blocks:
-                    chosen = random.choice(blocks)
-                    req.current_handler_id = chosen.id
-                    req.updated_at = now
-                    # Add 10 minutes for the new tier
-                    req.sla_deadline = now + timedelta(minutes=10)
-                    
-                    audit = models.AuditLog(
-                        request_id=req.id,
-                        action="ESCALATED_TO_BLOCK",
-                        actor_id=None, # System
-                        details=f"Village SLA exceeded. Auto-escalated to Block Officer {chosen.username}"
-                    )
-                    db.add(audit)
-                    
-            # Tier 2 Miss: Block -> Escalate to District
-            elif req.status == models.RequestStatus.PENDING_BLOCK:
-                req.status = models.RequestStatus.PENDING_DISTRICT
-                districts = db.query(models.User).filter(models.User.role == models.UserRole.DISTRICT_OFFICER).all()
-                if districts:
-                    chosen = random.choice(districts)
-                    req.current_handler_id = chosen.id
-                    req.updated_at = now
-                    # District is final, no further SLA escalation
-                    req.sla_deadline = None 
-                    
-                    audit = models.AuditLog(
-                        request_id=req.id,
-                        action="ESCALATED_TO_DISTRICT",
-                        actor_id=None, # System
-                        details=f"Block SLA exceeded. Auto-escalated to District Officer {chosen.username}"
-                    )
-                    db.add(audit)
-                else:
-                    # Fallback if no district officer
-                    directors = db.query(models.User).filter(models.User.role == models.UserRole.DIRECTOR).all()
-                    if directors:
-                        chosen = random.choice(directors)
-                        req.current_handler_id = chosen.id
-                        req.updated_at = now
-                        req.sla_deadline = None
-                        audit = models.AuditLog(
-                            request_id=req.id,
-                            action="ESCALATED_TO_DIRECTOR",
-                            actor_id=None,
-                            details="Block SLA exceeded. No District Officer found, auto-escalated to Director."
-                        )
-                        db.add(audit)
-        
-        if expired_requests:
-            db.commit()
-            print(f"Escalated {len(expired_requests)} delayed agricultural requests.")
-            
-    except Exception as e:
-        print(f"Error in SLA monitor: {e}")
-    finally:
-        db.close()
-
-scheduler = BackgroundScheduler()
-scheduler.add_job(check_sla_violations, 'interval', minutes=1)
-scheduler.start()
-
-@app.on_event("shutdown")
-def shutdown_event():
-    scheduler.shutdown()
-
 @app.get("/")
 def read_root():
     return {"message": "Welcome to SPGS API"}
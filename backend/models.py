@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text, Float
+from sqlalchemy import func, Column, Integer, String, DateTime, ForeignKey, Enum, Text, Float, Index
 from sqlalchemy.orm import relationship
+from sqlalchemy.schema import CreateIndex
 from datetime import datetime
 import enum
 
@@ -80,6 +81,16 @@ class Request(Base):
     actioned_by = relationship("User", foreign_keys=[actioned_by_id])
     audit_logs = relationship("AuditLog", back_populates="request", order_by="AuditLog.timestamp")
 
+    __table_args__ = (
+        Index("ix_requests_handler_id", "current_handler_id", "id"), # Officer queues
+        Index("ix_requests_submitter_id", "submitter_id", "id"), # Farmer dashboards
+        Index("ix_requests_status_sla_deadline", "status", "sla_deadline"), # SLA sweeper
+        Index("ix_requests_sla_deadline", "sla_deadline", "id"), # sort=deadline
+        Index("ix_requests_location", "district", "taluk", "village"), # Location filters
+        Index("ix_requests_created_at", "created_at"), # Date-range filters
+        Index("ix_requests_updated_at", "updated_at"),
+    )
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
 
@@ -92,8 +103,65 @@ class AuditLog(Base):
 
     request = relationship("Request", back_populates="audit_logs")
 
+    __table_args__ = (
+        Index("ix_audit_logs_actor_action_request", "actor_id", "action", "request_id"), # Officer history/escalations
+        Index("ix_audit_logs_request_timestamp", "request_id", "timestamp"), # Request.audit_logs
+        Index("ix_audit_logs_timestamp_id", "timestamp", "id"), # /admin/audit-logs keyset paging
+    )
+
 class SystemConfig(Base):
     __tablename__ = "system_config"
 
     key = Column(String(50), primary_key=True)
     value = Column(String(255))
+
+class SlaPolicy(Base):
+    __tablename__ = "sla_policies"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # The pending status the deadline applies to
+    tier = Column(Enum(RequestStatus))
+    urgency = Column(Enum(UrgencyLevel))
+    district = Column(String(50), nullable=True) # None = every district; stored stripped
+    minutes = Column(Integer)
+
+    __table_args__ = (
+        # One policy per tier, urgency and district, whatever the district's case
+        # (and one statewide policy: NULL districts would never collide)
+        Index("uq_sla_policies_tier_urgency_district_ci", "tier", "urgency", func.coalesce(func.lower(district), ""), unique=True),
+    )
+
+class Jurisdiction(Base):
+    __tablename__ = "jurisdictions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    officer_id = Column(Integer, ForeignKey("users.id"), index=True)
+    # District alone for a District Officer, + taluk for a Block Officer, + village for a Village Officer
+    district = Column(String(50))
+    taluk = Column(String(50), nullable=True)
+    village = Column(String(50), nullable=True)
+
+    officer = relationship("User")
+
+class Lease(Base):
+    __tablename__ = "leases"
+
+    name = Column(String(50), primary_key=True)
+    holder = Column(String(100))
+    expires_at = Column(DateTime)
+
+class Captcha(Base):
+    __tablename__ = "captchas"
+
+    id = Column(String(36), primary_key=True)
+    text = Column(String(10))
+    expires_at = Column(DateTime, index=True)
+
+def create_missing_indexes(bind):
+    # create_all() skips indexes on tables that already exist, so bring
+    # databases created before an index was declared up to date. IF NOT
+    # EXISTS rather than checkfirst: reflection can't see expression indexes.
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
@@ -1,6 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from .. import database, schemas, models, auth, crud
+from typing import Optional
+from datetime import datetime
+from .. import database, async_database, schemas, models, auth, crud, async_crud, assignment, jurisdiction, system_config, sla_policy, export
 
 router = APIRouter(
     prefix="/admin",
@@ -14,13 +17,15 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)
     db_user = crud.get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    return crud.create_user(db=db, user=user)
+    db_user = crud.create_user(db=db, user=user)
+    assignment.officer_load.add_officer(db_user)
+    return db_user
 
 @router.get("/users", response_model=list[schemas.UserOut])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+async def read_users(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(async_database.get_async_read_db), current_user: models.User = Depends(auth.get_current_user_async)):
     if current_user.role != models.UserRole.DIRECTOR:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.get_users(db, skip=skip, limit=limit)
+    return await async_crud.get_users(db, skip=skip, limit=limit)
 
 @router.put("/users/{user_id}/reset-password")
 def reset_user_password(user_id: int, reset: schemas.PasswordReset, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
@@ -40,17 +45,110 @@ def set_sla(minutes: int, db: Session = Depends(database.get_db), current_user:
     if current_user.role != models.UserRole.DIRECTOR:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    config = db.query(models.SystemConfig).filter(models.SystemConfig.key == "sla_minutes").first()
-    if not config:
-        config = models.SystemConfig(key="sla_minutes", value=str(minutes))
-        db.add(config)
-    else:
-        config.value = str(minutes)
-    db.commit()
+    system_config.system_config.set(db, "sla_minutes", minutes)
     return {"message": f"SLA updated to {minutes} minutes"}
 
+@router.get("/sla-policies", response_model=list[schemas.SlaPolicyOut])
+def read_sla_policies(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    if current_user.role != models.UserRole.DIRECTOR:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return crud.get_sla_policies(db)
+
+@router.put("/sla-policies", response_model=schemas.SlaPolicyOut)
+def set_sla_policy(policy: schemas.SlaPolicyCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    if current_user.role != models.UserRole.DIRECTOR:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if policy.tier not in sla_policy.SLA_TIERS:
+        raise HTTPException(status_code=400, detail="SLA policies apply to the Pending_Village, Pending_Block and Pending_District tiers")
+    return crud.set_sla_policy(db=db, policy=policy)
+
+@router.delete("/sla-policies/{policy_id}")
+def delete_sla_policy(policy_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    if current_user.role != models.UserRole.DIRECTOR:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if not crud.delete_sla_policy(db=db, policy_id=policy_id):
+        raise HTTPException(status_code=404, detail="SLA policy not found")
+    return {"message": "SLA policy removed"}
+
 @router.get("/audit-logs", response_model=list[schemas.AuditLogOut])
-def read_audit_logs(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+async def read_audit_logs(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = Query(None, description="Opaque X-Next-Cursor value from the previous page; takes precedence over skip"), db: AsyncSession = Depends(async_database.get_async_read_db), current_user: models.User = Depends(auth.get_current_user_async)):
+    if current_user.role != models.UserRole.DIRECTOR:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    before = None
+    if cursor is not None:
+        try:
+            before = crud.decode_timestamp_cursor(cursor)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    logs = await async_crud.get_audit_logs(db, skip=skip, limit=limit, before=before)
+    if logs and len(logs) >= limit:
+        response.headers["X-Next-Cursor"] = crud.encode_cursor(logs[-1].timestamp, logs[-1].id)
+    return logs
+
+@router.get("/export/requests")
+def export_requests(
+    fmt: str = Query("ndjson", alias="format", description="'ndjson' or 'csv'"),
+    gzip: bool = False,
+    since: Optional[datetime] = Query(None, description="Only requests created at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only requests created before this time"),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    if current_user.role != models.UserRole.DIRECTOR:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if fmt not in export.MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Format must be 'ndjson' or 'csv'")
+    return export.streaming_response("requests", export.requests_query(since, until), fmt, gzip)
+
+@router.get("/export/audit-logs")
+def export_audit_logs(
+    fmt: str = Query("ndjson", alias="format", description="'ndjson' or 'csv'"),
+    gzip: bool = False,
+    since: Optional[datetime] = Query(None, description="Only entries logged at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only entries logged before this time"),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    if current_user.role != models.UserRole.DIRECTOR:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if fmt not in export.MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Format must be 'ndjson' or 'csv'")
+    return export.streaming_response("audit-logs", export.audit_logs_query(since, until), fmt, gzip)
+
+@router.get("/officer-load", response_model=list[schemas.OfficerLoadOut])
+def read_officer_load(current_user: models.User = Depends(auth.get_current_user)):
+    if current_user.role != models.UserRole.DIRECTOR:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return assignment.officer_load.snapshot()
+
+@router.get("/jurisdictions", response_model=list[schemas.JurisdictionOut])
+def read_jurisdictions(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    if current_user.role != models.UserRole.DIRECTOR:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return crud.get_jurisdictions(db)
+
+@router.post("/jurisdictions", response_model=schemas.JurisdictionOut)
+def create_jurisdiction(entry: schemas.JurisdictionCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    if current_user.role != models.UserRole.DIRECTOR:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    officer = crud.get_user(db, user_id=entry.officer_id)
+    if not officer:
+        raise HTTPException(status_code=404, detail="Officer not found")
+    if officer.role == models.UserRole.VILLAGE_OFFICER and not (entry.taluk and entry.village):
+        raise HTTPException(status_code=400, detail="Village Officers need a district, taluk and village")
+    elif officer.role == models.UserRole.BLOCK_OFFICER and not entry.taluk:
+        raise HTTPException(status_code=400, detail="Block Officers need a district and taluk")
+    elif officer.role not in [models.UserRole.VILLAGE_OFFICER, models.UserRole.BLOCK_OFFICER, models.UserRole.DISTRICT_OFFICER]:
+        raise HTTPException(status_code=400, detail="Jurisdictions can only be assigned to Village, Block or District Officers")
+
+    db_jurisdiction = crud.create_jurisdiction(db=db, jurisdiction=entry)
+    jurisdiction.jurisdictions.load()
+    return db_jurisdiction
+
+@router.delete("/jurisdictions/{jurisdiction_id}")
+def delete_jurisdiction(jurisdiction_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
     if current_user.role != models.UserRole.DIRECTOR:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return db.query(models.AuditLog).order_by(models.AuditLog.timestamp.desc()).offset(skip).limit(limit).all()
+    if not crud.delete_jurisdiction(db=db, jurisdiction_id=jurisdiction_id):
+        raise HTTPException(status_code=404, detail="Jurisdiction not found")
+    jurisdiction.jurisdictions.load()
+    return {"message": "Jurisdiction removed"}
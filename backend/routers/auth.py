@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from typing import Optional
@@ -7,19 +8,13 @@ from jose import JWTError, jwt
 from pydantic import BaseModel
 from fastapi import Request
 import uuid
-import random
-import string
-import base64
-from captcha.image import ImageCaptcha
-import time
 from backend.database import SessionLocal
 from backend import models
 
-from .. import database, schemas, models, auth, crud
+from .. import database, async_database, schemas, models, auth, crud, async_crud, captcha_pool, captcha_store
 
-# In-memory store for CAPTCHAs (ID -> {text, expires_at})
-# In a production distributed environment, use Redis.
-CAPTCHA_STORE = {}
+# Issued CAPTCHAs (ID -> text), shared across workers unless CAPTCHA_STORE=memory
+CAPTCHA_STORE = captcha_store.get_captcha_store()
 
 
 router = APIRouter(
@@ -55,41 +50,16 @@ def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
 
 @router.get("/captcha")
 def generate_captcha():
-    print("CAPTCHA: Start generation")
     # Clean up expired captchas
-    current_time = time.time()
-    expired_keys = [k for k, v in CAPTCHA_STORE.items() if v['expires_at'] < current_time]
-    for k in expired_keys:
-        del CAPTCHA_STORE[k]
-    print("CAPTCHA: Cleaned expired")
-
-    # Generate random 5-character string (excluding confusing characters like O, 0, I, 1, l)
-    chars = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
-    captcha_text = ''.join(random.choice(chars) for _ in range(5))
+    CAPTCHA_STORE.evict_expired()
+
+    # Pre-rendered by the background producer
+    captcha_text, image_url = captcha_pool.captcha_pool.take()
     captcha_id = str(uuid.uuid4())
-    print(f"CAPTCHA: Generated text {captcha_text}")
-    
+
     # Store with a 5-minute expiration
-    CAPTCHA_STORE[captcha_id] = {
-        'text': captcha_text,
-        'expires_at': current_time + 300
-    }
-    print("CAPTCHA: Stored locally")
-    
-    try:
-        # Generate image
-        print("CAPTCHA: Init ImageCaptcha")
-        image = ImageCaptcha(width=160, height=60)
-        print("CAPTCHA: Calling generate()")
-        data = image.generate(captcha_text)
-        print("CAPTCHA: Encoding...")
-        base64_img = base64.b64encode(data.getvalue()).decode('utf-8')
-        image_url = f"data:image/png;base64,{base64_img}"
-        print("CAPTCHA: Success!")
-        return {"captcha_id": captcha_id, "image_data": image_url}
-    except Exception as e:
-        print(f"CAPTCHA Error: {e}")
-        raise e
+    CAPTCHA_STORE.put(captcha_id, captcha_text, ttl_seconds=300)
+    return {"captcha_id": captcha_id, "image_data": image_url}
 
 @router.post("/login", response_model=schemas.Token)
 def login_for_access_token(req: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
@@ -103,23 +73,20 @@ def login_for_access_token(req: Request, form_data: OAuth2PasswordRequestForm =
             detail="CAPTCHA is required"
         )
         
-    stored_captcha = CAPTCHA_STORE.get(captcha_id)
-    if not stored_captcha:
+    # Single use either way: a failed attempt burns the token to prevent
+    # brute forcing the same image, a solved one is removed from the store
+    stored_text = CAPTCHA_STORE.pop(captcha_id)
+    if not stored_text:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="CAPTCHA expired or invalid ID. Please refresh the image."
         )
         
-    if stored_captcha['text'].upper() != captcha_value.upper():
-        # Clean up the failed attempt's token to prevent brute forcing the same image
-        del CAPTCHA_STORE[captcha_id]
+    if stored_text.upper() != captcha_value.upper():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect CAPTCHA entered. Please try again."
         )
-        
-    # Successfully solved, remove it from memory
-    del CAPTCHA_STORE[captcha_id]
 
     # 2. Proceed with DB username/password check
     user = crud.get_user_by_username(db, username=form_data.username)
@@ -181,5 +148,5 @@ def refresh_access_token(body: RefreshRequest, db: Session = Depends(database.ge
     }
 
 @router.get("/managers", response_model=list[schemas.UserOut])
-def read_managers(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    return crud.get_managers(db)
+async def read_managers(db: AsyncSession = Depends(async_database.get_async_read_db), current_user: models.User = Depends(auth.get_current_user_async)):
+    return await async_crud.get_managers(db)
@@ -1,12 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, File, HTTPException, Query, Response, UploadFile, status
+from sqlalchemy import insert, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from .. import database, schemas, models, auth, crud
-from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from .. import database, async_database, schemas, models, auth, crud, async_crud, sla, sla_policy, assignment, intake, search
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+INCLUDE_QUERY = Query(None, description="Comma-separated extras to embed in each request, e.g. 'audit_logs'")
+
+CURSOR_QUERY = Query(None, description="Opaque X-Next-Cursor value from the previous page; takes precedence over skip")
+
+# Requests one bulk action may touch, all in a single transaction
+BULK_ACTION_MAX_IDS = 500
+
+def _includes_audit_logs(include: Optional[str]) -> bool:
+    return bool(include) and "audit_logs" in [part.strip() for part in include.split(",")]
+
+def _seek(cursor: Optional[str], sort: str = "newest") -> Optional[tuple]:
+    if cursor is None:
+        return None
+    try:
+        return crud.decode_request_cursor(cursor, sort)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+def _set_next_cursor(response: Response, page: list, limit: int, sort: str = "newest"):
+    if page and len(page) >= limit:
+        response.headers["X-Next-Cursor"] = crud.request_cursor(page[-1], sort)
+
+def _visibility_criteria(current_user: models.User, include_history: bool = False) -> Optional[list]:
+    """WHERE clauses limiting requests to those the user's list shows (plus their history), or None for none at all."""
+    if current_user.role == models.UserRole.FARMER:
+        return [models.Request.submitter_id == current_user.id]
+    if current_user.role in [models.UserRole.VILLAGE_OFFICER, models.UserRole.BLOCK_OFFICER, models.UserRole.DISTRICT_OFFICER]:
+        queue = crud.officer_requests_criteria(current_user.id)
+        return [or_(queue, crud.actioned_by_criteria(current_user.id)) if include_history else queue]
+    if current_user.role == models.UserRole.DIRECTOR:
+        return []
+    return None
+
+def _request_filters(
+    statuses: Optional[List[models.RequestStatus]] = Query(None, alias="status", description="Repeat to match any of several statuses"),
+    urgency: Optional[List[models.UrgencyLevel]] = Query(None, description="Repeat to match any of several urgencies"),
+    district: Optional[str] = None,
+    taluk: Optional[str] = None,
+    village: Optional[str] = None,
+    created_from: Optional[datetime] = Query(None, description="Created at or after"),
+    created_to: Optional[datetime] = Query(None, description="Created before"),
+    updated_from: Optional[datetime] = Query(None, description="Last updated at or after"),
+    updated_to: Optional[datetime] = Query(None, description="Last updated before"),
+    sla_breached: bool = Query(False, description="Only pending requests past their SLA deadline"),
+) -> schemas.RequestFilters:
+    return schemas.RequestFilters(
+        status=statuses, urgency=urgency, district=district, taluk=taluk, village=village,
+        created_from=created_from, created_to=created_to, updated_from=updated_from, updated_to=updated_to,
+        sla_breached=sla_breached,
+    )
+
 router = APIRouter(
     prefix="/requests",
     tags=["requests"]
@@ -31,12 +84,12 @@ def create_request(
                 raise HTTPException(status_code=400, detail=f"Target user role '{target_manager.role}' is not a Village Officer")
             handler_id = target_manager.id
         else:
-            handler_id = current_user.manager_id
+            # The village officer for the land's location, else the farmer's own manager
+            local_officer = assignment.officer_load.pick_local(models.UserRole.VILLAGE_OFFICER, request.district, request.taluk, request.village)
+            handler_id = local_officer.id if local_officer else current_user.manager_id
 
             if not handler_id:
-                fallback = db.query(models.User).filter(
-                    models.User.role == models.UserRole.VILLAGE_OFFICER
-                ).first()
+                fallback = assignment.officer_load.pick(models.UserRole.VILLAGE_OFFICER)
                 if fallback:
                     handler_id = fallback.id
                 else:
@@ -51,6 +104,8 @@ def create_request(
         new_request.current_handler_id = handler_id
         db.commit()
         db.refresh(new_request)
+        sla.escalations.track(new_request)
+        assignment.officer_load.move(None, handler_id)
         logger.info(f"Agricultural Request #{new_request.id} created by Farmer '{current_user.username}'")
         return new_request
     except HTTPException:
@@ -59,125 +114,122 @@ def create_request(
         logger.exception(f"Unexpected error creating request for user '{current_user.username}': {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.post("/bulk", response_model=schemas.BulkIntakeOut)
+def create_requests_bulk(
+    rows: List[Dict[str, Any]] = Body(..., description="Array of request objects, same fields as POST /requests/"),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    if current_user.role != models.UserRole.FARMER:
+        raise HTTPException(status_code=403, detail="Only Farmers can submit requests.")
+    return intake.submit_batch(db, rows, current_user)
+
+@router.post("/bulk/csv", response_model=schemas.BulkIntakeOut)
+def create_requests_bulk_csv(
+    file: UploadFile = File(..., description="CSV with a header row of POST /requests/ field names"),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    if current_user.role != models.UserRole.FARMER:
+        raise HTTPException(status_code=403, detail="Only Farmers can submit requests.")
+    return intake.submit_batch(db, intake.csv_rows(file.file), current_user)
+
 @router.get("/", response_model=List[schemas.RequestOut])
-def read_requests(
+async def read_requests(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    cursor: Optional[str] = CURSOR_QUERY,
+    include: Optional[str] = INCLUDE_QUERY,
+    sort: str = Query("newest", description="'newest', 'oldest' or 'deadline' (soonest SLA deadline first)"),
+    filters: schemas.RequestFilters = Depends(_request_filters),
+    db: AsyncSession = Depends(async_database.get_async_read_db),
+    current_user: models.User = Depends(auth.get_current_user_async)
 ):
+    if sort not in crud.REQUEST_SORTS:
+        raise HTTPException(status_code=400, detail="Sort must be one of: " + ", ".join(crud.REQUEST_SORTS))
+    include_audit_logs = _includes_audit_logs(include)
+    seek = _seek(cursor, sort)
+    criteria = crud.request_filter_criteria(filters)
+
     if current_user.role == models.UserRole.FARMER:
-        requests = crud.get_requests_by_user(db, user_id=current_user.id, skip=skip, limit=limit)
+        requests = await async_crud.get_requests_by_user(db, user_id=current_user.id, skip=skip, limit=limit, include_audit_logs=include_audit_logs, seek=seek, filters=criteria, sort=sort)
+        _set_next_cursor(response, requests, limit, sort)
     elif current_user.role in [models.UserRole.VILLAGE_OFFICER, models.UserRole.BLOCK_OFFICER, models.UserRole.DISTRICT_OFFICER]:
-        # Get active requests in their queue
-        queue_requests = crud.get_requests_by_handler(db, handler_id=current_user.id, skip=skip, limit=limit)
-        
-        # Get requests they previously escalated/approved that are still pending somewhere above them
-        audit_logs = db.query(models.AuditLog.request_id).filter(
-            models.AuditLog.actor_id == current_user.id,
-            models.AuditLog.action.in_(["APPROVED_VILLAGE", "APPROVED_BLOCK", "ESCALATED"])
-        ).distinct().all()
-        
-        escalated_ids = [log[0] for log in audit_logs]
-        escalated_requests = []
-        if escalated_ids:
-            escalated_requests = db.query(models.Request).filter(
-                models.Request.id.in_(escalated_ids),
-                models.Request.status.in_([models.RequestStatus.PENDING_BLOCK, models.RequestStatus.PENDING_DISTRICT])
-            ).order_by(models.Request.id.desc()).all()
-            
-        # Combine and deduplicate
-        all_requests_dict = {req.id: req for req in queue_requests + escalated_requests}
-        requests = list(all_requests_dict.values())
-        requests.sort(key=lambda r: r.id, reverse=True)
+        # Their active queue plus requests they approved/escalated that are still pending above them
+        requests = await async_crud.get_officer_requests(db, officer_id=current_user.id, skip=skip, limit=limit, include_audit_logs=include_audit_logs, seek=seek, filters=criteria, sort=sort)
+        _set_next_cursor(response, requests, limit, sort)
     elif current_user.role == models.UserRole.DIRECTOR:
-        requests = db.query(models.Request).order_by(models.Request.id.desc()).offset(skip).limit(limit).all()
+        requests = await async_crud.get_requests(db, skip=skip, limit=limit, include_audit_logs=include_audit_logs, seek=seek, filters=criteria, sort=sort)
+        _set_next_cursor(response, requests, limit, sort)
     else:
         requests = []
 
-    for req in requests:
-        if req.current_handler_id:
-            handler = db.query(models.User).filter(models.User.id == req.current_handler_id).first()
-            req.handler_username = handler.username if handler else None
-        else:
-            req.handler_username = None
-
-        if req.actioned_by_id:
-            actor = db.query(models.User).filter(models.User.id == req.actioned_by_id).first()
-            req.actioned_by_username = actor.username if actor else None
-        else:
-            req.actioned_by_username = None
+    return crud.attach_usernames(requests)
 
-        if req.submitter_id:
-            submitter = db.query(models.User).filter(models.User.id == req.submitter_id).first()
-            req.submitter_username = submitter.username if submitter else None
-        else:
-            req.submitter_username = None
+@router.get("/search", response_model=List[schemas.RequestOut])
+async def search_requests(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in the title, description, farmer name, village or survey number"),
+    skip: int = 0,
+    limit: int = 20,
+    include: Optional[str] = INCLUDE_QUERY,
+    filters: schemas.RequestFilters = Depends(_request_filters),
+    db: AsyncSession = Depends(async_database.get_async_read_db),
+    current_user: models.User = Depends(auth.get_current_user_async)
+):
+    if not search.available(database.engine):
+        raise HTTPException(status_code=501, detail="Search is not available on this database")
+    match = search.match_expression(q)
+    if not match:
+        raise HTTPException(status_code=400, detail="Search query has no searchable words")
+
+    # Same visibility as GET /requests/
+    visibility = _visibility_criteria(current_user)
+    if visibility is None:
+        return []
 
-    return requests
+    criteria = crud.request_filter_criteria(filters) + visibility
+    requests = await async_crud.search_requests(db, match, skip=skip, limit=limit, include_audit_logs=_includes_audit_logs(include), filters=criteria)
+    return crud.attach_usernames(requests)
 
 @router.get("/history", response_model=List[schemas.RequestOut])
-def get_request_history(
+async def get_request_history(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    cursor: Optional[str] = CURSOR_QUERY,
+    include: Optional[str] = INCLUDE_QUERY,
+    db: AsyncSession = Depends(async_database.get_async_read_db),
+    current_user: models.User = Depends(auth.get_current_user_async)
 ):
     if current_user.role == models.UserRole.FARMER:
         raise HTTPException(status_code=403, detail="Farmers use the main requests endpoint.")
         
-    # Find all unique request IDs where this officer is the actor in the audit logs
-    audit_logs = db.query(models.AuditLog.request_id).filter(
-        models.AuditLog.actor_id == current_user.id
-    ).distinct().all()
-    
-    request_ids = [log[0] for log in audit_logs]
-    
-    if not request_ids:
-        return []
-        
-    requests = db.query(models.Request).filter(
-        models.Request.id.in_(request_ids)
-    ).order_by(models.Request.id.desc()).offset(skip).limit(limit).all()
+    # Every request this officer has acted on, per the audit logs
+    requests = await async_crud.get_requests_actioned_by(db, actor_id=current_user.id, skip=skip, limit=limit, include_audit_logs=_includes_audit_logs(include), seek=_seek(cursor))
+    _set_next_cursor(response, requests, limit)
     
-    for req in requests:
-        if req.current_handler_id:
-            handler = db.query(models.User).filter(models.User.id == req.current_handler_id).first()
-            req.handler_username = handler.username if handler else None
-        else:
-            req.handler_username = None
-
-        if req.actioned_by_id:
-            actor = db.query(models.User).filter(models.User.id == req.actioned_by_id).first()
-            req.actioned_by_username = actor.username if actor else None
-        else:
-            req.actioned_by_username = None
-
-        if req.submitter_id:
-            submitter = db.query(models.User).filter(models.User.id == req.submitter_id).first()
-            req.submitter_username = submitter.username if submitter else None
-        else:
-            req.submitter_username = None
-
-    return requests
+    return crud.attach_usernames(requests)
 
-
-def get_sla_minutes(db: Session):
-    config = db.query(models.SystemConfig).filter(models.SystemConfig.key == "sla_minutes").first()
-    return int(config.value) if config else 10
-
-
-@router.put("/{request_id}/status", response_model=schemas.RequestOut)
-def update_request_status(
+@router.get("/{request_id}", response_model=schemas.RequestOut)
+async def read_request(
     request_id: int,
-    update_data: schemas.RequestUpdate,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(async_database.get_async_read_db),
+    current_user: models.User = Depends(auth.get_current_user_async)
 ):
-    request = db.query(models.Request).filter(models.Request.id == request_id).first()
+    # One request with its audit trail, for the details view; list pages leave the trails out
+    visibility = _visibility_criteria(current_user, include_history=True)
+    request = await async_crud.get_request(db, request_id, filters=visibility) if visibility is not None else None
     if not request:
         raise HTTPException(status_code=404, detail="Request not found")
-
+    return crud.attach_usernames([request])[0]
+
+def _apply_status_action(request: models.Request, update_data: schemas.RequestUpdate, current_user: models.User):
+    """
+    Tiered approval/rejection of one request, shared by the single and bulk
+    endpoints. Raises HTTPException if the action isn't allowed, possibly
+    after changing some attributes; returns the values of its AuditLog row.
+    """
     if request.current_handler_id != current_user.id and current_user.role != models.UserRole.DIRECTOR:
         raise HTTPException(status_code=403, detail="Not authorized to approve/reject this request")
 
@@ -203,11 +255,11 @@ def update_request_status(
             # Move to Block Officer
             request.status = models.RequestStatus.PENDING_BLOCK
             request.actioned_by_id = current_user.id
-            request.sla_deadline = datetime.utcnow() + timedelta(minutes=get_sla_minutes(db))
+            request.sla_deadline = sla_policy.policies.deadline(request.status, request.urgency, request.district)
             action_taken = "APPROVED_VILLAGE"
             
-            # Find a block officer (in a real system, look up the geographical mapping)
-            block_officer = db.query(models.User).filter(models.User.role == models.UserRole.BLOCK_OFFICER).first()
+            # Least-loaded block officer for the request's taluk
+            block_officer = assignment.officer_load.pick(models.UserRole.BLOCK_OFFICER, request.district, request.taluk, request.village)
             if block_officer:
                 request.current_handler_id = block_officer.id
             else:
@@ -217,11 +269,11 @@ def update_request_status(
             # Move to District Officer
             request.status = models.RequestStatus.PENDING_DISTRICT
             request.actioned_by_id = current_user.id
-            request.sla_deadline = datetime.utcnow() + timedelta(minutes=get_sla_minutes(db))
+            request.sla_deadline = sla_policy.policies.deadline(request.status, request.urgency, request.district)
             action_taken = "APPROVED_BLOCK"
             
-            # Find a district officer
-            district_officer = db.query(models.User).filter(models.User.role == models.UserRole.DISTRICT_OFFICER).first()
+            # Least-loaded district officer for the request's district
+            district_officer = assignment.officer_load.pick(models.UserRole.DISTRICT_OFFICER, request.district, request.taluk, request.village)
             if district_officer:
                 request.current_handler_id = district_officer.id
             else:
@@ -239,7 +291,7 @@ def update_request_status(
             action_taken = "APPROVED_FINAL"
             
             # Notify Farmer
-            farmer = db.query(models.User).filter(models.User.id == request.submitter_id).first()
+            farmer = request.submitter
             logger.info(f"*** SMS NOTIFICATION TRIGGERED ***")
             logger.info(f"To: Farmer {farmer.username} (ID: {farmer.id})")
             logger.info(f"Message: Your application for '{request.title}' (Aadhar: ****{request.aadhar_number[-4:]}) has been APPROVED by the District Office. Supply is granted.")
@@ -247,16 +299,47 @@ def update_request_status(
 
     request.updated_at = datetime.utcnow()
 
-    audit = models.AuditLog(
-        request_id=request.id,
-        action=action_taken,
-        actor_id=current_user.id,
-        details=update_data.rejection_reason or f"Approved at {current_user.role} level"
-    )
+    return {
+        "request_id": request.id,
+        "action": action_taken,
+        "actor_id": current_user.id,
+        "details": update_data.rejection_reason or f"Approved at {current_user.role} level"
+    }
+
+def _apply_verification(request: models.Request, current_user: models.User):
+    """Mark one request's documents verified; returns the values of its AuditLog row."""
+    if request.current_handler_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to verify this request")
+        
+    request.documents_verified = 1  # 1 for True in SQLite Integer representation (or True for Boolean)
+    request.updated_at = datetime.utcnow()
+    
+    return {
+        "request_id": request.id,
+        "action": "DOCUMENTS_VERIFIED",
+        "actor_id": current_user.id,
+        "details": "Village Officer manually verified PAN, Aadhar, and Survey Numbers."
+    }
+
+@router.put("/{request_id}/status", response_model=schemas.RequestOut)
+def update_request_status(
+    request_id: int,
+    update_data: schemas.RequestUpdate,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    request = db.query(models.Request).filter(models.Request.id == request_id).first()
+    if not request:
+        raise HTTPException(status_code=404, detail="Request not found")
+
+    previous_handler_id = request.current_handler_id
+    audit = models.AuditLog(**_apply_status_action(request, update_data, current_user))
     db.add(audit)
     db.commit()
     db.refresh(request)
-    logger.info(f"Agricultural Request #{request.id} {action_taken} by '{current_user.username}'")
+    sla.escalations.track(request)
+    assignment.officer_load.move(previous_handler_id, request.current_handler_id if request.status in crud.OPEN_STATUSES else None)
+    logger.info(f"Agricultural Request #{request.id} {audit.action} by '{current_user.username}'")
     return request
 
 @router.put("/{request_id}/verify", response_model=schemas.RequestOut)
@@ -272,24 +355,68 @@ def verify_documents(
     if not request:
         raise HTTPException(status_code=404, detail="Request not found")
         
-    if request.current_handler_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to verify this request")
-        
-    request.documents_verified = 1  # 1 for True in SQLite Integer representation (or True for Boolean)
-    request.updated_at = datetime.utcnow()
-    
-    audit = models.AuditLog(
-        request_id=request.id,
-        action="DOCUMENTS_VERIFIED",
-        actor_id=current_user.id,
-        details="Village Officer manually verified PAN, Aadhar, and Survey Numbers."
-    )
+    audit = models.AuditLog(**_apply_verification(request, current_user))
     db.add(audit)
     db.commit()
     db.refresh(request)
     logger.info(f"Request #{request_id} documents verified by '{current_user.username}'")
     return request
 
+@router.post("/bulk-action", response_model=schemas.BulkActionOut)
+def bulk_action(
+    batch: schemas.BulkAction,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    VERIFY, APPROVE or REJECT many requests with the same rules as the
+    single-request endpoints, in one transaction: one SELECT for the
+    requests, one executemany INSERT for the audit trail, one commit.
+    Requests the action isn't allowed on are reported and left unchanged.
+    """
+    if batch.action not in ["VERIFY", "APPROVE", "REJECT"]:
+        raise HTTPException(status_code=400, detail="Invalid action. Must be VERIFY, APPROVE or REJECT.")
+    if batch.action == "VERIFY" and current_user.role != models.UserRole.VILLAGE_OFFICER:
+        raise HTTPException(status_code=403, detail="Only Village Officers can verify documents")
+    request_ids = list(dict.fromkeys(batch.ids))
+    if len(request_ids) > BULK_ACTION_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_ACTION_MAX_IDS} requests per batch")
+
+    requests = {request.id: request for request in crud.get_requests_by_ids(db, request_ids)}
+    update_data = schemas.RequestUpdate(action=batch.action, rejection_reason=batch.rejection_reason, expected_delivery_date=batch.expected_delivery_date)
+    results, audits, changed = [], [], []
+    with assignment.officer_load.reservation(db) as officers:
+        for request_id in request_ids:
+            request = requests.get(request_id)
+            if request is None:
+                results.append({"id": request_id, "error": "Request not found"})
+                continue
+            previous_handler_id = request.current_handler_id
+            try:
+                if batch.action == "VERIFY":
+                    audits.append(_apply_verification(request, current_user))
+                else:
+                    audits.append(_apply_status_action(request, update_data, current_user))
+            except HTTPException as e:
+                # Drop whatever the failed check had already changed on this request
+                db.expire(request)
+                results.append({"id": request_id, "error": e.detail})
+                continue
+            officers.move(previous_handler_id, request.current_handler_id if request.status in crud.OPEN_STATUSES else None)
+            # Captured now: the commit expires the objects and reading them back would cost a SELECT each
+            changed.append((request.id, request.status, request.sla_deadline))
+            results.append({"id": request_id, "status": request.status})
+
+        if audits:
+            db.flush()
+            db.execute(insert(models.AuditLog.__table__), audits)
+    for request_id, new_status, deadline in changed:
+        sla.escalations.schedule(request_id, deadline if new_status in crud.SLA_TRACKED_STATUSES else None)
+
+    succeeded = len(changed)
+    logger.info(f"Bulk {batch.action} by '{current_user.username}': {succeeded} succeeded, {len(results) - succeeded} failed")
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
 @router.put("/{request_id}", response_model=schemas.RequestOut)
 def edit_request(
     request_id: int,
@@ -307,6 +434,8 @@ def edit_request(
     if request.status != models.RequestStatus.PENDING_VILLAGE:
         raise HTTPException(status_code=400, detail="Cannot edit request once it has been processed by the Village Officer")
 
+    previous_handler_id = request.current_handler_id
+
     if request_update.title:
         request.title = request_update.title
     if request_update.description:
@@ -334,5 +463,6 @@ def edit_request(
 
     db.commit()
     db.refresh(request)
+    assignment.officer_load.move(previous_handler_id, request.current_handler_id)
     logger.info(f"Agricultural Request #{request_id} edited by Farmer '{current_user.username}'")
     return request
@@ -18,6 +18,36 @@ class UserOut(UserBase):
     class Config:
         from_attributes = True
 
+class OfficerLoadOut(BaseModel):
+    officer_id: int
+    username: str
+    role: UserRole
+    open_requests: int
+
+class JurisdictionCreate(BaseModel):
+    officer_id: int
+    district: str
+    taluk: Optional[str] = None
+    village: Optional[str] = None
+
+class JurisdictionOut(JurisdictionCreate):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+class SlaPolicyCreate(BaseModel):
+    tier: RequestStatus = Field(..., description="Pending_Village, Pending_Block or Pending_District")
+    urgency: UrgencyLevel
+    district: Optional[str] = None
+    minutes: int = Field(..., gt=0)
+
+class SlaPolicyOut(SlaPolicyCreate):
+    id: int
+
+    class Config:
+        from_attributes = True
+
 class RequestBase(BaseModel):
     title: str
     description: str
@@ -38,6 +68,28 @@ class RequestCreate(RequestBase):
     target_manager_id: Optional[int] = None # Farmer assigning directly to Village Officer
     pan_number: Optional[str] = None
 
+class BulkRowResult(BaseModel):
+    row: int # 1-based position in the submitted array or CSV (after the header)
+    request_id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkIntakeOut(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkRowResult]
+
+class RequestFilters(BaseModel):
+    status: Optional[List[RequestStatus]] = None
+    urgency: Optional[List[UrgencyLevel]] = None
+    district: Optional[str] = None
+    taluk: Optional[str] = None
+    village: Optional[str] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+    updated_from: Optional[datetime] = None
+    updated_to: Optional[datetime] = None
+    sla_breached: bool = False
+
 class RequestEdit(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -60,6 +112,22 @@ class RequestUpdate(BaseModel):
     rejection_reason: Optional[str] = None
     expected_delivery_date: Optional[datetime] = None
 
+class BulkAction(BaseModel):
+    ids: List[int] = Field(..., min_length=1)
+    action: str = Field(..., description="'VERIFY', 'APPROVE' or 'REJECT'")
+    rejection_reason: Optional[str] = None
+    expected_delivery_date: Optional[datetime] = None
+
+class BulkActionResult(BaseModel):
+    id: int
+    status: Optional[RequestStatus] = None # New status when the action was applied
+    error: Optional[str] = None
+
+class BulkActionOut(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkActionResult]
+
 class AuditLogOut(BaseModel):
     id: int
     request_id: int
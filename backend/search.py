@@ -0,0 +1,83 @@
+"""
+Full-text search over applications, backed by an SQLite FTS5 index. The
+index is an external-content table over requests, so it stores only the
+inverted index; triggers keep it in step with every write path (the ORM,
+bulk intake's Core inserts, manual SQL) without any application code.
+"""
+import re
+
+from sqlalchemy import column, func, inspect, literal_column, select, table
+
+from . import models, crud
+
+SEARCH_TABLE = "requests_fts"
+# Indexed columns with their bm25 weights: a hit in a name, title or survey
+# number outranks one buried in the description
+SEARCH_COLUMNS = {"title": 4.0, "description": 1.0, "farmer_name": 4.0, "village": 2.0, "survey_number": 4.0}
+# Terms after this many are ignored, so one query can't fan out across the index
+SEARCH_MAX_TERMS = 8
+
+_fts = table(SEARCH_TABLE, column("rowid"))
+_columns = ", ".join(SEARCH_COLUMNS)
+_new_values = ", ".join(f"new.{name}" for name in SEARCH_COLUMNS)
+_old_values = ", ".join(f"old.{name}" for name in SEARCH_COLUMNS)
+
+_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5({_columns}, content='requests', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON requests BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON requests BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+    END""",
+    # Only edits to indexed columns touch the index; status changes and
+    # escalations leave it alone
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF {_columns} ON requests BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+        INSERT INTO {SEARCH_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values});
+    END""",
+]
+
+
+def available(bind):
+    return bind.dialect.name == "sqlite"
+
+
+def create_search_index(bind):
+    """Create the index and its triggers if missing, building it from existing rows the first time."""
+    if not available(bind):
+        return
+    with bind.begin() as conn:
+        created = not inspect(conn).has_table(SEARCH_TABLE)
+        for statement in _DDL:
+            conn.exec_driver_sql(statement)
+        if created:
+            conn.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(query: str) -> str:
+    """
+    Turn free text into an FTS5 MATCH expression: every word must match, the
+    last one as a prefix (for search-as-you-type). Words are quoted, so FTS5
+    operators and punctuation in user input are searched for, never parsed.
+    Returns "" when there is nothing searchable.
+    """
+    terms = [term.replace('"', '""') for term in query.split() if re.search(r"\w", term)][:SEARCH_MAX_TERMS]
+    if not terms:
+        return ""
+    return " ".join(f'"{term}"' for term in terms) + "*"
+
+
+def search_stmt(match: str, *criteria, skip: int = 0, limit: int = 100, include_audit_logs: bool = False):
+    """Requests matching an FTS5 expression and criteria, best match first."""
+    rank = func.bm25(literal_column(SEARCH_TABLE), *SEARCH_COLUMNS.values())
+    return (
+        select(models.Request)
+        .join(_fts, _fts.c.rowid == models.Request.id)
+        .options(*crud.request_list_loads(include_audit_logs))
+        .where(literal_column(SEARCH_TABLE).op("MATCH")(match), *criteria)
+        .order_by(rank, models.Request.id.desc())
+        .offset(skip)
+        .limit(limit)
+    )
@@ -0,0 +1,299 @@
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, insert, update
+
+from . import models, database, crud, lease, assignment, sla_policy
+
+logger = logging.getLogger(__name__)
+
+# How often the in-memory schedule is rebuilt from the database, to pick up
+# deadlines set by other processes (scripts, other API workers).
+RESYNC_SECONDS = 300
+# How often the earliest pending deadline is probed in between full reloads,
+# so requests created on follower workers escalate on time.
+PROBE_SECONDS = 5
+# Back-off after a failed sweep so a persistent DB error doesn't spin.
+RETRY_SECONDS = 5
+# Expired requests escalated per transaction.
+ESCALATION_CHUNK_SIZE = 500
+
+# executemany statements for the sweep. The b_status guard leaves alone any
+# request an officer acted on after the chunk was read.
+_requests = models.Request.__table__
+ESCALATE_REQUEST = update(_requests).where(
+    _requests.c.id == bindparam("b_id"),
+    _requests.c.status == bindparam("b_status")
+).values(
+    status=bindparam("new_status"),
+    current_handler_id=bindparam("handler_id"),
+    updated_at=bindparam("now"),
+    sla_deadline=bindparam("deadline")
+)
+MOVE_REQUEST_TIER = update(_requests).where(
+    _requests.c.id == bindparam("b_id"),
+    _requests.c.status == bindparam("b_status")
+).values(status=bindparam("new_status"))
+
+
+def _escalation(request_id, status, new_status, handler_id, now, deadline):
+    return {"b_id": request_id, "b_status": status, "new_status": new_status, "handler_id": handler_id, "now": now, "deadline": deadline}
+
+def _escalation_audit(request_id, action, details):
+    return {"request_id": request_id, "action": action, "actor_id": None, "details": details} # System
+
+
+def check_sla_violations(chunk_size=ESCALATION_CHUNK_SIZE):
+    """
+    Escalate every pending request whose SLA deadline has passed.
+    Works through the backlog in chunks, each one a single bulk UPDATE plus a
+    bulk audit INSERT in its own short transaction, so a burst of expirations
+    doesn't hold the write lock against officers for the whole sweep.
+    Returns (request_id, new_deadline) for each escalated request so the
+    caller can reschedule it.
+    """
+    rescheduled = []
+    db = database.SessionLocal()
+    try:
+        now = datetime.utcnow()
+        # Officers come from the in-memory queue-depth index, not a roster query
+        officers = assignment.officer_load
+
+        last_id = 0
+        while True:
+            # Find the next chunk of pending requests that have missed their SLA
+            expired = crud.get_expired_requests(db, now, after_id=last_id, limit=chunk_size)
+            if not expired:
+                break
+            last_id = expired[-1].id
+
+            with officers.reservation(db):
+                # Per escalated request: the queue move, audit row and new deadline,
+                # applied only if its guarded UPDATE actually lands
+                escalations, stranded, pending = [], [], {}
+                for request_id, status, urgency, handler_id, district, taluk, village in expired:
+
+                    # Tier 1 Miss: Village -> Escalate to Block
+                    if status == models.RequestStatus.PENDING_VILLAGE:
+                        chosen = officers.pick(models.UserRole.BLOCK_OFFICER, district, taluk, village)
+                        if chosen:
+                            # The block tier's deadline for this urgency and district
+                            deadline = sla_policy.policies.deadline(models.RequestStatus.PENDING_BLOCK, urgency, district, now)
+                            escalations.append(_escalation(request_id, status, models.RequestStatus.PENDING_BLOCK, chosen.id, now, deadline))
+                            audit = _escalation_audit(request_id, "ESCALATED_TO_BLOCK", f"Village SLA exceeded. Auto-escalated to Block Officer {chosen.username}")
+                        else:
+                            stranded.append({"b_id": request_id, "b_status": status, "new_status": models.RequestStatus.PENDING_BLOCK})
+                            continue
+
+                    # Tier 2 Miss: Block -> Escalate to District
+                    elif status == models.RequestStatus.PENDING_BLOCK:
+                        # District is final, no further SLA escalation
+                        deadline = None
+                        chosen = officers.pick(models.UserRole.DISTRICT_OFFICER, district, taluk, village) or officers.pick(models.UserRole.DIRECTOR)
+                        if chosen and chosen.role == models.UserRole.DISTRICT_OFFICER:
+                            escalations.append(_escalation(request_id, status, models.RequestStatus.PENDING_DISTRICT, chosen.id, now, None))
+                            audit = _escalation_audit(request_id, "ESCALATED_TO_DISTRICT", f"Block SLA exceeded. Auto-escalated to District Officer {chosen.username}")
+                        elif chosen:
+                            # Fallback if no district officer
+                            escalations.append(_escalation(request_id, status, models.RequestStatus.PENDING_DISTRICT, chosen.id, now, None))
+                            audit = _escalation_audit(request_id, "ESCALATED_TO_DIRECTOR", "Block SLA exceeded. No District Officer found, auto-escalated to Director.")
+                        else:
+                            stranded.append({"b_id": request_id, "b_status": status, "new_status": models.RequestStatus.PENDING_DISTRICT})
+                            continue
+                    else:
+                        continue
+
+                    # Only the chosen officer is counted now; the old handler's
+                    # queue is settled once the commit shows the escalation landed
+                    officers.move(None, chosen.id)
+                    pending[request_id] = (handler_id, chosen.id, audit, deadline)
+
+                escalated = []
+                if escalations:
+                    db.execute(ESCALATE_REQUEST, escalations)
+                    # The b_status guard skips requests an officer acted on since
+                    # the chunk was read. Rows stamped with this sweep's time are
+                    # the ones that moved; the UPDATE holds their write locks, so
+                    # nothing else can have touched them since.
+                    escalated = crud.get_requests_updated_at(db, list(pending), now)
+                if stranded:
+                    db.execute(MOVE_REQUEST_TIER, stranded)
+                if escalated:
+                    db.execute(insert(models.AuditLog.__table__), [pending[request_id][2] for request_id in escalated])
+
+            escalated = set(escalated)
+            # Now in the final tier: no deadline to track
+            rescheduled.extend((move["b_id"], None) for move in stranded if move["new_status"] == models.RequestStatus.PENDING_DISTRICT)
+            for request_id, (handler_id, chosen_id, _, deadline) in pending.items():
+                if request_id in escalated:
+                    officers.move(handler_id, None)
+                    rescheduled.append((request_id, deadline))
+                else:
+                    # Lost the race to an officer, whose action moved the queues itself
+                    officers.move(chosen_id, None)
+            if escalated:
+                logger.info(f"Escalated {len(escalated)} delayed agricultural requests.")
+
+    except Exception:
+        db.rollback()
+        logger.exception("Error in SLA monitor")
+    finally:
+        db.close()
+    return rescheduled
+
+
+class EscalationScheduler:
+    """
+    Keeps upcoming SLA deadlines in a min-heap and wakes exactly when the
+    earliest one passes, instead of polling the requests table on an interval.
+
+    Superseded heap entries are skipped lazily: _deadlines holds the current
+    deadline per request and only a heap entry matching it is live.
+    """
+
+    def __init__(self, sweep=check_sla_violations, resync_seconds=RESYNC_SECONDS, probe_seconds=PROBE_SECONDS):
+        self._sweep = sweep
+        self._resync_seconds = resync_seconds
+        self._probe_seconds = probe_seconds
+        self._heap = []
+        self._deadlines = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        # Set to stop the current worker thread; each start() makes a new one,
+        # so a thread from an earlier run can never be revived by a later start()
+        self._stop_event = threading.Event()
+        self._running = False
+
+    def schedule(self, request_id, deadline):
+        """Track a request's SLA deadline; None stops tracking it."""
+        with self._cond:
+            # Only the leader process keeps a schedule; it reloads it on start()
+            if not self._running or self._deadlines.get(request_id) == deadline:
+                return
+            if deadline is None:
+                self._deadlines.pop(request_id, None)
+                return
+            self._deadlines[request_id] = deadline
+            heapq.heappush(self._heap, (deadline, request_id))
+            if self._heap[0] == (deadline, request_id):
+                # New earliest deadline: wake the worker to shorten its sleep
+                self._cond.notify()
+
+    def track(self, request):
+        """Bring the schedule in line with a request that was just committed."""
+        pending = request.status in crud.SLA_TRACKED_STATUSES
+        self.schedule(request.id, request.sla_deadline if pending else None)
+
+    def next_deadline(self):
+        with self._cond:
+            return self._peek()
+
+    def probe(self):
+        """Pick up the earliest pending deadline, wherever it was set."""
+        db = database.SessionLocal()
+        try:
+            earliest = crud.get_next_sla_deadline(db)
+        finally:
+            db.close()
+        if earliest:
+            self.schedule(earliest.id, earliest.sla_deadline)
+
+    def load(self):
+        """Rebuild the schedule from the pending requests in the database."""
+        db = database.SessionLocal()
+        try:
+            pending = crud.get_sla_deadlines(db)
+        finally:
+            db.close()
+        with self._cond:
+            if not self._running:
+                # Stopped while loading; the next start() reloads
+                return
+            self._deadlines = dict(pending)
+            self._heap = [(deadline, request_id) for request_id, deadline in pending]
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def start(self):
+        previous = self._thread
+        if previous and previous.is_alive():
+            if not self._stop_event.is_set():
+                return
+            # Stopped mid-sweep (stop() gave up waiting): let that sweep finish
+            # first, so two threads never escalate side by side
+            previous.join()
+        stop_event = threading.Event()
+        with self._cond:
+            self._stop_event = stop_event
+            self._running = True
+        self.load()
+        self._thread = threading.Thread(target=self._run, args=(stop_event,), name="sla-escalations", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stop_event.set()
+            self._running = False
+            self._deadlines = {}
+            self._heap = []
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            if not self._thread.is_alive():
+                self._thread = None
+
+    def _peek(self):
+        # Drop entries superseded by a later schedule() call
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def _pop_due(self, now):
+        due = []
+        while self._peek() is not None and self._heap[0][0] < now:
+            _, request_id = heapq.heappop(self._heap)
+            del self._deadlines[request_id]
+            due.append(request_id)
+        return due
+
+    def _run(self, stop_event):
+        next_resync = datetime.utcnow() + timedelta(seconds=self._resync_seconds)
+        next_probe = datetime.utcnow() + timedelta(seconds=self._probe_seconds)
+        while True:
+            with self._cond:
+                if stop_event.is_set():
+                    return
+                now = datetime.utcnow()
+                due = self._pop_due(now)
+                if not due:
+                    wake_at = min(filter(None, [self._peek(), next_probe, next_resync]))
+                    self._cond.wait(max((wake_at - now).total_seconds(), 0))
+            if due:
+                try:
+                    for request_id, deadline in self._sweep():
+                        self.schedule(request_id, deadline)
+                except Exception:
+                    logger.exception("Error in SLA scheduler")
+                    with self._cond:
+                        self._cond.wait(RETRY_SECONDS)
+            elif datetime.utcnow() >= next_resync:
+                try:
+                    self.load()
+                except Exception:
+                    logger.exception("Error reloading SLA schedule")
+                next_resync = datetime.utcnow() + timedelta(seconds=self._resync_seconds)
+            elif datetime.utcnow() >= next_probe:
+                try:
+                    self.probe()
+                except Exception:
+                    logger.exception("Error probing SLA schedule")
+                next_probe = datetime.utcnow() + timedelta(seconds=self._probe_seconds)
+
+
+escalations = EscalationScheduler()
+
+# Only the process holding this lease runs escalations, so several API
+# workers can share one database without racing each other.
+leadership = lease.LeaderLease("sla-escalations", on_acquire=escalations.start, on_release=escalations.stop)
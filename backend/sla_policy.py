@@ -0,0 +1,87 @@
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, update
+
+from . import models, database, system_config
+
+# Statuses a request waits in, each with its own deadline
+SLA_TIERS = [models.RequestStatus.PENDING_VILLAGE, models.RequestStatus.PENDING_BLOCK, models.RequestStatus.PENDING_DISTRICT]
+# Used when no policy covers a tier and urgency and no global sla_minutes is set
+DEFAULT_SLA_MINUTES = 10
+
+_NOT_LOADED = object()
+
+
+def _district_key(district):
+    return (district or "").strip().casefold() or None
+
+
+def normalize_districts(bind):
+    """
+    Strip stored districts and drop rows that differ from a newer one only by
+    the district's case or spacing, so uq_sla_policies_tier_urgency_district_ci
+    can be built on databases that predate it.
+    """
+    policies = models.SlaPolicy.__table__
+    with bind.begin() as conn:
+        rows = conn.execute(select(policies.c.id, policies.c.tier, policies.c.urgency, policies.c.district).order_by(policies.c.id.desc())).all()
+        seen = set()
+        for row in rows:
+            district = (row.district or "").strip() or None
+            key = (row.tier, row.urgency, (district or "").lower())
+            if key in seen:
+                conn.execute(delete(policies).where(policies.c.id == row.id))
+                continue
+            seen.add(key)
+            if district != row.district:
+                conn.execute(update(policies).where(policies.c.id == row.id).values(district=district))
+
+
+class SlaPolicyTable:
+    """
+    The sla_policies table compiled into a dict keyed by (tier, urgency,
+    district), so a deadline costs two dict lookups and no query. A district
+    policy overrides the statewide one for its tier and urgency; with
+    neither, the global sla_minutes setting applies. Recompiled when the
+    system_config version moves, which every policy change bumps.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._minutes = {}
+        self._version = _NOT_LOADED
+
+    def load(self):
+        # Read the version first: a change committed mid-load triggers another reload
+        version = system_config.system_config.version()
+        policies = models.SlaPolicy.__table__
+        with database.engine.connect() as conn:
+            rows = conn.execute(select(policies.c.tier, policies.c.urgency, policies.c.district, policies.c.minutes)).all()
+        compiled = {(row.tier, row.urgency, _district_key(row.district)): row.minutes for row in rows}
+        with self._lock:
+            self._minutes = compiled
+            self._version = version
+
+    def minutes_for(self, tier, urgency=None, district=None):
+        version = system_config.system_config.version()
+        with self._lock:
+            stale = version != self._version
+        if stale:
+            self.load()
+        urgency = urgency or models.UrgencyLevel.MEDIUM
+        district = _district_key(district)
+        with self._lock:
+            minutes = self._minutes.get((tier, urgency, district)) if district else None
+            if minutes is None:
+                minutes = self._minutes.get((tier, urgency, None))
+        if minutes is None:
+            minutes = system_config.system_config.get_int("sla_minutes", DEFAULT_SLA_MINUTES)
+        return minutes
+
+    def deadline(self, tier, urgency=None, district=None, now=None):
+        """When a request entering tier must be acted on."""
+        return (now or datetime.utcnow()) + timedelta(minutes=self.minutes_for(tier, urgency, district))
+
+
+policies = SlaPolicyTable()
@@ -0,0 +1,103 @@
+import threading
+import time
+
+from sqlalchemy import String, cast, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.types import Integer
+
+from . import models, database
+
+# Reserved system_config row bumped on every change. Each worker compares it
+# with the version it loaded, at most once per VERSION_CHECK_SECONDS.
+VERSION_KEY = "config_version"
+VERSION_CHECK_SECONDS = 5
+
+
+def _bump_version_stmt():
+    # Incremented in SQL so concurrent writers never land on the same version
+    config = models.SystemConfig.__table__
+    return update(config).where(config.c.key == VERSION_KEY).values(value=cast(cast(config.c.value, Integer) + 1, String))
+
+
+class SystemConfigCache:
+    """
+    In-memory copy of the system_config table. Reads are dict lookups; a
+    change made through set() reloads this process at once and reaches the
+    other workers through the version row.
+    """
+
+    def __init__(self, check_seconds=VERSION_CHECK_SECONDS):
+        self._check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._values = {}
+        self._version = None
+        self._checked_at = None
+
+    def load(self):
+        config = models.SystemConfig.__table__
+        with database.engine.connect() as conn:
+            values = dict(conn.execute(select(config.c.key, config.c.value)).all())
+        with self._lock:
+            self._values = values
+            self._version = values.get(VERSION_KEY)
+            self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._checked_at = None
+
+    def get(self, key, default=None):
+        self._ensure_fresh()
+        with self._lock:
+            return self._values.get(key, default)
+
+    def version(self):
+        """Current config version; changes whenever any setting or SLA policy does."""
+        self._ensure_fresh()
+        with self._lock:
+            return self._version
+
+    def get_int(self, key, default):
+        value = self.get(key)
+        return int(value) if value is not None else default
+
+    def set(self, db, key, value):
+        """Upsert key and bump the version in db's transaction, then commit."""
+        config = db.query(models.SystemConfig).filter(models.SystemConfig.key == key).first()
+        if not config:
+            db.add(models.SystemConfig(key=key, value=str(value)))
+        else:
+            config.value = str(value)
+        self.bump_version(db)
+        db.commit()
+        self.invalidate()
+
+    def bump_version(self, db):
+        """Mark the config as changed for every worker; commits with db's transaction."""
+        if db.execute(_bump_version_stmt()).rowcount:
+            return
+        try:
+            with db.begin_nested():
+                db.execute(insert(models.SystemConfig.__table__).values(key=VERSION_KEY, value="1"))
+        except IntegrityError:
+            # Another writer created it first
+            db.execute(_bump_version_stmt())
+
+    def _ensure_fresh(self):
+        with self._lock:
+            checked_at = self._checked_at
+            loaded_version = self._version
+        if checked_at is not None and time.monotonic() - checked_at < self._check_seconds:
+            return
+        if checked_at is not None:
+            config = models.SystemConfig.__table__
+            with database.engine.connect() as conn:
+                version = conn.execute(select(config.c.value).where(config.c.key == VERSION_KEY)).scalar()
+            if version == loaded_version:
+                with self._lock:
+                    self._checked_at = time.monotonic()
+                return
+        self.load()
+
+
+system_config = SystemConfigCache()
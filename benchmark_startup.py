@@ -0,0 +1,85 @@
+"""
+Measures API cold start: how long `import backend.main` takes in a fresh
+interpreter, and how long uvicorn takes from launch to the first 200 on GET /.
+Each run uses a throwaway database and working directory.
+
+Usage: python benchmark_startup.py [--runs 5] [--warmup]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import backend.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def run_env(workdir, warmup):
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "startup-benchmark")
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}"
+    env.pop("READ_DATABASE_URL", None)
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env["STARTUP_WARMUP"] = "1" if warmup else "0"
+    return env
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_import(warmup):
+    with tempfile.TemporaryDirectory() as workdir:
+        output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=workdir, env=run_env(workdir, warmup),
+                                capture_output=True, text=True, check=True).stdout
+        return float(output.strip().splitlines()[-1])
+
+
+def time_first_response(warmup, timeout=60):
+    with tempfile.TemporaryDirectory() as workdir:
+        port = free_port()
+        start = time.perf_counter()
+        server = subprocess.Popen([sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+                                  cwd=workdir, env=run_env(workdir, warmup), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while time.perf_counter() - start < timeout:
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                        if response.status == 200:
+                            return time.perf_counter() - start
+                except OSError:
+                    time.sleep(0.02)
+            raise RuntimeError(f"No response from uvicorn within {timeout}s")
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+def report(label, samples):
+    print(f"{label:<22} median {statistics.median(samples) * 1000:8.1f} ms   "
+          f"min {min(samples) * 1000:8.1f} ms   max {max(samples) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="store_true", help="start with STARTUP_WARMUP=1")
+    args = parser.parse_args()
+
+    report("import backend.main", [time_import(args.warmup) for _ in range(args.runs)])
+    report("time to first response", [time_first_response(args.warmup) for _ in range(args.runs)])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
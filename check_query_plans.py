@@ -0,0 +1,85 @@
+"""
+Runs the hot read paths against the local database and reports any query
+whose SQLite plan falls back to a full table scan (EXPLAIN QUERY PLAN).
+
+Usage: python check_query_plans.py   (exits non-zero if a scan is found)
+"""
+import sys
+from datetime import datetime
+
+from sqlalchemy import event
+
+from backend import crud, database, models, schemas, search
+
+models.Base.metadata.create_all(bind=database.engine)
+models.create_missing_indexes(database.engine)
+search.create_search_index(database.engine)
+
+captured = []
+
+def capture(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip().upper().startswith("SELECT") and (statement, parameters) not in captured:
+        captured.append((statement, parameters))
+
+def officer(db, role):
+    # Any existing user of the role; a transient one is enough to shape the queries.
+    return db.query(models.User).filter(models.User.role == role).first() or models.User(id=0, username="plan_check", role=role)
+
+OFFICER_ROLES = [models.UserRole.VILLAGE_OFFICER, models.UserRole.BLOCK_OFFICER, models.UserRole.DISTRICT_OFFICER]
+
+def run_hot_paths(db, farmer, officers):
+    crud.get_requests_by_user(db, user_id=farmer.id)
+    crud.get_requests_by_user(db, user_id=farmer.id, seek=(1000,))
+    for user in officers:
+        # Same statements the async list endpoints run through async_crud
+        crud.get_officer_requests(db, officer_id=user.id, include_audit_logs=True)
+        crud.get_requests_actioned_by(db, actor_id=user.id)
+    # GET /requests filters on the director's unscoped list
+    for filters in [
+        schemas.RequestFilters(district="D", taluk="T"),
+        schemas.RequestFilters(created_from=datetime(2000, 1, 1), created_to=datetime(2000, 2, 1)),
+        schemas.RequestFilters(sla_breached=True),
+    ]:
+        crud.get_requests(db, filters=crud.request_filter_criteria(filters))
+    # sort=deadline: first page, a cursor page, and the undated phase after it
+    crud.get_requests(db, sort="deadline")
+    crud.get_requests(db, sort="deadline", seek=(datetime.utcnow(), 1000))
+    crud.get_requests(db, sort="deadline", seek=(None, 1000))
+    # GET /requests/search, as a farmer and as an officer
+    match = search.match_expression("ravi S1")
+    db.scalars(search.search_stmt(match, models.Request.submitter_id == farmer.id)).all()
+    db.scalars(search.search_stmt(match, crud.officer_requests_criteria(officers[0].id))).all()
+    crud.get_expired_requests(db, datetime.utcnow())
+    crud.get_audit_logs(db)
+    crud.get_audit_logs(db, before=(datetime.utcnow(), 1000))
+
+def main():
+    db = database.SessionLocal()
+    farmer = officer(db, models.UserRole.FARMER)
+    officers = [officer(db, role) for role in OFFICER_ROLES]
+    event.listen(database.engine, "before_cursor_execute", capture)
+    try:
+        run_hot_paths(db, farmer, officers)
+    finally:
+        event.remove(database.engine, "before_cursor_execute", capture)
+        db.close()
+
+    full_scans = 0
+    with database.engine.connect() as conn:
+        for statement, parameters in captured:
+            plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+            details = [row[-1] for row in plan]
+            # "SCAN t USING INDEX ..." is an ordered index walk; a bare "SCAN t" reads the whole table.
+            # "SCAN t VIRTUAL TABLE INDEX ..." is an FTS5 MATCH lookup.
+            scans = [d for d in details if d.startswith("SCAN ") and " USING " not in d and " VIRTUAL TABLE " not in d]
+            if scans:
+                full_scans += 1
+                print("FULL SCAN:", " ".join(statement.split()))
+                for detail in details:
+                    print("    " + detail)
+
+    print(f"Checked {len(captured)} hot queries, {full_scans} with full table scans.")
+    return 1 if full_scans else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
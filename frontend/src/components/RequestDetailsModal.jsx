@@ -1,11 +1,26 @@
+import { useState, useEffect } from 'react';
 import { X, Clock, User, FileText, CheckCircle, AlertCircle, AlertTriangle } from 'lucide-react';
 
+import api from '../api';
 import StatusBadge from './StatusBadge';
 import UrgencyBadge from './UrgencyBadge';
 
 import { formatDateSafe, formatDistanceSafe } from '../utils/dateUtils';
 
 const RequestDetailsModal = ({ isOpen, onClose, request }) => {
+    // List pages don't carry audit trails; fetch this request's when the modal opens
+    const [auditLogs, setAuditLogs] = useState([]);
+
+    useEffect(() => {
+        if (!isOpen || !request) return;
+        let cancelled = false;
+        setAuditLogs(request.audit_logs || []);
+        api.get(`/requests/${request.id}`)
+            .then(res => { if (!cancelled) setAuditLogs(res.data.audit_logs || []); })
+            .catch(err => console.error(err));
+        return () => { cancelled = true; };
+    }, [isOpen, request?.id]);
+
     if (!isOpen || !request) return null;
 
     return (
@@ -200,13 +215,13 @@ const RequestDetailsModal = ({ isOpen, onClose, request }) => {
                     )}
 
                     {/* Approval History Trail */}
-                    {request.audit_logs && request.audit_logs.length > 0 && (
+                    {auditLogs.length > 0 && (
                         <div style={{ marginTop: '24px' }}>
                             <div style={{ fontSize: '0.875rem', fontWeight: 600, color: 'var(--text-primary)', marginBottom: '12px', display: 'flex', alignItems: 'center', gap: '6px' }}>
                                 <Clock size={16} /> History & Routing
                             </div>
                             <div style={{ display: 'flex', flexDirection: 'column', gap: '12px' }}>
-                                {request.audit_logs.map((log, index) => (
+                                {auditLogs.map((log, index) => (
                                     <div key={log.id} style={{
                                         display: 'flex', gap: '12px', padding: '12px',
                                         backgroundColor: '#f9fafb', borderRadius: '8px',
@@ -1,17 +1,20 @@
 import os
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from backend.models import Base, User, UserRole, SystemConfig
 from backend.auth import get_password_hash
-from backend.database import SQLALCHEMY_DATABASE_URL
+from backend.database import create_db_engine
 
 def reset_database():
     db_path = "./spgs_db.sqlite"
     if os.path.exists(db_path):
         os.remove(db_path)
         print("Deleted existing database.")
+    # WAL-mode sidecar files must go with it, or SQLite may replay them into the new file
+    for sidecar in (db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
 
-    engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+    engine = create_db_engine()
     Base.metadata.create_all(bind=engine)
     
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)